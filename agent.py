@@ -2,14 +2,57 @@
 An AI player for Othello.
 """
 
+import atexit
+import json
+import os
 import random
 import sys
 import time
 
 # You can use the functions in othello_shared to write your AI
 from othello_shared import find_lines, get_possible_moves, get_score, play_move
+from othello_protocol import introduction, setup_version, read_position, next_game, encode_info
+from othello_profile import profiler_from_env
+from othello_cache import BoundedCache
+from othello_clock import TimeManager
+from othello_tt import SharedTranspositionTable, SHARED_TT_ENV
 
-caching_states = {}
+# Cached leaf evaluations of minimax, least recently used entries are evicted past the budget.
+# Alpha-beta caches interior nodes in bound_states instead; its leaves are cheaper to evaluate than to look up.
+CACHE_MAX_ENTRIES = 500000
+caching_states = BoundedCache(max_entries=CACHE_MAX_ENTRIES)
+
+# Results of searched interior nodes, used for transposition and enhanced transposition cutoffs (ETC):
+# (board, color to move, color) -> (depth, flag, value, best move). Only filled when caching is on.
+# May be replaced by a SharedTranspositionTable (see use_shared_table), which only othello_tt.py -z clears.
+EXACT, LOWER, UPPER = 0, 1, 2
+bound_states = BoundedCache(max_entries=CACHE_MAX_ENTRIES)
+bound_states_shared = False
+ETC_MIN_DEPTH = 3  # ETC is tried at nodes with at least this remaining depth
+etc_stats = {"probes": 0, "hits": 0, "cutoffs": 0}
+
+# perf_counter() value at which a timed search is aborted, None if untimed
+search_deadline = None
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Alpha-beta nodes visited by the current search
+search_stats = {"nodes": 0}
+
+# Called as info_callback(depth, nodes, seconds, value, pv) after each completed search, None for no reports
+info_callback = None
+
+
+# ProbCut model: remaining depth -> (shallow depth, a, b, sigma), fitted by othello_probcut.py.
+# Empty means ProbCut is off.
+PROBCUT_ENV = "OTHELLO_PROBCUT"
+probcut_model = {}
+probcut_threshold = 1.5  # confidence, in standard deviations of the fit
+probcut_path = None  # file probcut_model was loaded from
+PROBCUT_MIN_SLOPE = 1e-3  # fits with a smaller slope a cannot be inverted into a shallow bound
 
 
 def eprint(*args, **kwargs):  # you can use this for debugging, as it will print to sterr and not stdout
@@ -85,6 +128,24 @@ def compute_heuristic(board, color):
     return 0.2 * compute_utility(board, color) + 0.2 * compute_choice(board, color) + 0.7 * compute_corner(board, color)
 
 
+def hashable_board(board):
+    """
+    The board as a tuple of row tuples, like play_move returns, so that it
+    can be a cache key. Boards given to the select_move functions may be lists.
+    """
+    return tuple(tuple(row) for row in board)
+
+
+def cached_utility(board, color):
+    """
+    compute_utility through caching_states, which is keyed by board alone.
+    """
+    value = caching_states.get(board)
+    if value is None:
+        value = caching_states[board] = compute_utility(board, color)
+    return value
+
+
 ############ MINIMAX ###############################
 def minimax_min_node(board, color, limit, caching=0):
     # In the minimax_min_node function,
@@ -99,9 +160,7 @@ def minimax_min_node(board, color, limit, caching=0):
     possible_moves = get_possible_moves(board, min_color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_utility(board, color)
-            return best_move, caching_states[board]
+            return best_move, cached_utility(board, color)
         else:
             return best_move, compute_utility(board, color)
     for move in possible_moves:
@@ -119,9 +178,7 @@ def minimax_max_node(board, color, limit, caching=0):
     possible_moves = get_possible_moves(board, color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_utility(board, color)
-            return best_move, caching_states[board]
+            return best_move, cached_utility(board, color)
         else:
             return best_move, compute_utility(board, color)
 
@@ -147,6 +204,7 @@ def select_move_minimax(board, color, limit, caching=0):
     If caching is ON (i.e. 1), use state caching to reduce the number of state evaluations.
     If caching is OFF (i.e. 0), do NOT use state caching to reduce the number of state evaluations.
     """
+    board = hashable_board(board)
     caching_states.clear()
     move, _ = minimax_max_node(board, color, limit, caching)
     caching_states.clear()
@@ -154,54 +212,220 @@ def select_move_minimax(board, color, limit, caching=0):
 
 
 ############ ALPHA-BETA PRUNING #####################
+def load_probcut_model(path):
+    """
+    Load a ProbCut model written by othello_probcut.py and switch ProbCut on.
+    The file is read once; loading the same path again does nothing. Depths
+    whose fit has a slope a below PROBCUT_MIN_SLOPE are skipped, since the
+    shallow bounds divide by a.
+    """
+    global probcut_threshold, probcut_path
+    if path == probcut_path:
+        return
+    with open(path) as f:
+        data = json.load(f)
+    probcut_model.clear()
+    for depth, fit in data["depths"].items():
+        if fit["a"] < PROBCUT_MIN_SLOPE:
+            eprint("ProbCut: skipping depth {}, slope {} is too small".format(depth, fit["a"]))
+            continue
+        probcut_model[int(depth)] = (fit["shallow"], fit["a"], fit["b"], fit["sigma"])
+    probcut_threshold = data.get("threshold", probcut_threshold)
+    probcut_path = path
+    if bound_states_shared:
+        bound_states.set_config(search_config())
+
+
+def probcut(node, board, color, alpha, beta, limit, caching=0, ordering=0):
+    """
+    ProbCut test for a node with remaining depth limit. A shallow search
+    predicts the deep value as a * v + b; if the prediction is outside the
+    (alpha, beta) window by more than probcut_threshold standard deviations,
+    return the bound to cut with. Otherwise return None and search normally.
+    """
+    shallow, a, b, sigma = probcut_model[limit]
+    margin = probcut_threshold * sigma
+    if beta != float("inf"):
+        bound = (beta + margin - b) / a
+        _, value = node(board, color, bound - 1e-6, bound, shallow, caching, ordering)
+        if value >= bound:
+            return beta
+    if alpha != float("-inf"):
+        bound = (alpha - margin - b) / a
+        _, value = node(board, color, bound, bound + 1e-6, shallow, caching, ordering)
+        if value <= bound:
+            return alpha
+    return None
+
+
+def search_config():
+    """
+    Description of everything besides the position that a search value
+    depends on: the agent and its ProbCut model.
+    """
+    return json.dumps({"agent": os.path.basename(__file__), "threshold": probcut_threshold,
+                       "probcut": sorted(probcut_model.items())})
+
+
+def use_shared_table(name):
+    """
+    Keep interior search results in the shared-memory transposition table
+    with the given name (see othello_tt.py) instead of a private cache,
+    tagged with the current search_config.
+    """
+    global bound_states, bound_states_shared
+    bound_states = SharedTranspositionTable.attach(name)
+    bound_states.set_config(search_config())
+    bound_states_shared = True
+    atexit.register(bound_states.close)
+
+
+def clear_caches():
+    """
+    Forget cached states between searches. A shared table is left alone,
+    its entries stay valid and other processes may be using them.
+    """
+    caching_states.clear()
+    if not bound_states_shared:
+        bound_states.clear()
+
+
+def search_depth(limit):
+    """
+    Remaining depth as stored in bound_states; -1 means no depth limit.
+    """
+    return limit if limit >= 0 else -1
+
+
+def store_bound(board, color, to_move, limit, alpha, beta, value, move):
+    """
+    Record a searched node's value in bound_states, with the kind of bound
+    it is given the (alpha, beta) window it was searched with.
+    """
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    bound_states[(board, to_move, color)] = (search_depth(limit), flag, value, move)
+
+
+def probe_bound(board, color, to_move, alpha, beta, limit):
+    """
+    Look up a node in bound_states before generating its moves. Returns the
+    stored (move, value) if it was searched to the same depth and its value
+    is exact or a bound outside the (alpha, beta) window, else None.
+    """
+    entry = bound_states.get((board, to_move, color))
+    if entry is None or entry[0] != search_depth(limit):
+        return None
+    _, flag, value, move = entry
+    if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+        return move, value
+    return None
+
+
+def etc_cutoff(children, color, maximizing, alpha, beta, limit):
+    """
+    Enhanced transposition cutoff: look up every child of a node, given as
+    (move, board) pairs, in bound_states before searching any of them. At a
+    max node a child whose stored lower bound is >= beta proves the cutoff;
+    at a min node a child whose stored upper bound is <= alpha does. Returns
+    the (move, value) to cut with, or None.
+    """
+    child_to_move = get_opp_color(color) if maximizing else color
+    depth = search_depth(limit - 1)
+    for move, child in children:
+        etc_stats["probes"] += 1
+        entry = bound_states.get((child, child_to_move, color))
+        if entry is None or entry[0] != depth:
+            continue
+        etc_stats["hits"] += 1
+        _, flag, value, _ = entry
+        if (maximizing and flag != UPPER and value >= beta) or (not maximizing and flag != LOWER and value <= alpha):
+            etc_stats["cutoffs"] += 1
+            return move, value
+    return None
+
+
 def alphabeta_min_node(board, color, alpha, beta, limit, caching=0, ordering=0):
+    if search_deadline is not None and time.perf_counter() > search_deadline:
+        raise SearchTimeout
+    search_stats["nodes"] += 1
     value = float("inf")
     best_move = None
     min_color = get_opp_color(color)
+    if caching and limit != 0:
+        cut = probe_bound(board, color, min_color, alpha, beta, limit)
+        if cut is not None:
+            return cut
     possible_moves = get_possible_moves(board, min_color)
     if possible_moves == [] or limit == 0:
-        if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_utility(board, color)
-            return best_move, caching_states[board]
-        else:
-            return best_move, compute_utility(board, color)
-    for move in possible_moves:
-        state = play_move(board, min_color, move[0], move[1])
+        return best_move, compute_utility(board, color)  # cheaper than a caching_states lookup
+    if limit in probcut_model:
+        cut = probcut(alphabeta_min_node, board, color, alpha, beta, limit, caching, ordering)
+        if cut is not None:
+            return best_move, cut
+    if caching and (limit < 0 or limit >= ETC_MIN_DEPTH):
+        children = [(move, play_move(board, min_color, move[0], move[1])) for move in possible_moves]
+        cut = etc_cutoff(children, color, False, alpha, beta, limit)
+        if cut is not None:
+            return cut
+    else:  # played one at a time, a cutoff saves the rest
+        children = ((move, play_move(board, min_color, move[0], move[1])) for move in possible_moves)
+    beta_orig = beta
+    for move, state in children:
         nxt_move, nxt_value = alphabeta_max_node(state, color, alpha, beta, limit - 1, caching, ordering)
         if value > nxt_value:
             value, best_move = nxt_value, move
         if value <= alpha:
-            return best_move, value
+            break
         beta = min(beta, value)
 
+    if caching:
+        store_bound(board, color, min_color, limit, alpha, beta_orig, value, best_move)
     return best_move, value
 
 
 def alphabeta_max_node(board, color, alpha, beta, limit, caching=0, ordering=0):
+    if search_deadline is not None and time.perf_counter() > search_deadline:
+        raise SearchTimeout
+    search_stats["nodes"] += 1
     value = float("-inf")
     best_move = None
+    if caching and limit != 0:
+        cut = probe_bound(board, color, color, alpha, beta, limit)
+        if cut is not None:
+            return cut
     possible_moves = get_possible_moves(board, color)
     if possible_moves == [] or limit == 0:
-        if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_utility(board, color)
-            return best_move, caching_states[board]
-        else:
-            return best_move, compute_utility(board, color)
+        return best_move, compute_utility(board, color)  # cheaper than a caching_states lookup
+    if limit in probcut_model:
+        cut = probcut(alphabeta_max_node, board, color, alpha, beta, limit, caching, ordering)
+        if cut is not None:
+            return best_move, cut
+    if caching and (limit < 0 or limit >= ETC_MIN_DEPTH) or ordering:
+        children = [(move, play_move(board, color, move[0], move[1])) for move in possible_moves]
+    else:  # played one at a time, a cutoff saves the rest
+        children = ((move, play_move(board, color, move[0], move[1])) for move in possible_moves)
+    if caching and (limit < 0 or limit >= ETC_MIN_DEPTH):
+        cut = etc_cutoff(children, color, True, alpha, beta, limit)
+        if cut is not None:
+            return cut
     if ordering:
-        possible_moves = sorted(possible_moves,
-                                key=lambda moves: compute_utility(play_move(board, color, moves[0], moves[1]), color),
-                                reverse=True)
-    for move in possible_moves:
-        state = play_move(board, color, move[0], move[1])
+        children = sorted(children, key=lambda child: compute_utility(child[1], color), reverse=True)
+    alpha_orig = alpha
+    for move, state in children:
         nxt_move, nxt_value = alphabeta_min_node(state, color, alpha, beta, limit - 1, caching, ordering)
         if value < nxt_value:
             value, best_move = nxt_value, move
         if value >= beta:
-            return best_move, value
+            break
         alpha = max(alpha, value)
 
+    if caching:
+        store_bound(board, color, color, limit, alpha_orig, beta, value, best_move)
     return best_move, value
 
 
@@ -220,15 +444,136 @@ def select_move_alphabeta(board, color, limit, caching=0, ordering=0):
     If ordering is ON (i.e. 1), use node ordering to expedite pruning and reduce the number of state evaluations.
     If ordering is OFF (i.e. 0), do NOT use node ordering to expedite pruning and reduce the number of state evaluations.
     """
+    board = hashable_board(board)
     alpha = float("-inf")
     beta = float("inf")
-    caching_states.clear()
-    move, _ = alphabeta_max_node(board, color, alpha, beta, limit, caching, ordering)
-    caching_states.clear()
+    clear_caches()
+    search_stats["nodes"] = 0
+    start = time.perf_counter()
+    move, value = alphabeta_max_node(board, color, alpha, beta, limit, caching, ordering)
+    if info_callback is not None:
+        report_search(board, color, limit, start, move, value)
+    clear_caches()
+    return move
+
+
+def select_moves_multipv(board, color, limit, k, caching=0, ordering=0):
+    """
+    Return the k best moves for color as a list of (move, value, principal
+    variation), best first, searched to depth limit.
+    Once k moves have exact values, every other root move is searched with
+    the window (k-th best value, inf): a move that fails low cannot enter
+    the top k and costs only a bound. All lines share bound_states, so
+    with caching on, transpositions between them are searched once.
+    Moves tied with the k-th best value are not listed. The principal
+    variations are read from bound_states, so without caching they hold
+    only the first move.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1, not {}".format(k))
+    board = hashable_board(board)
+    clear_caches()
+    search_stats["nodes"] = 0
+    start = time.perf_counter()
+    possible_moves = get_possible_moves(board, color)
+    possible_moves.sort(key=lambda move: compute_utility(play_move(board, color, move[0], move[1]), color), reverse=True)
+    best = []  # (value, move), best first
+    for move in possible_moves:
+        alpha = best[-1][0] if len(best) >= k else float("-inf")
+        state = play_move(board, color, move[0], move[1])
+        _, value = alphabeta_min_node(state, color, alpha, float("inf"), limit - 1, caching, ordering)
+        if value > alpha:  # exact, since the window is open above
+            best.append((value, move))
+            best.sort(key=lambda entry: -entry[0])
+            del best[k:]
+    lines = [(move, value, principal_variation(board, color, move, limit)) for value, move in best]
+    if info_callback is not None and lines:
+        info_callback(limit, search_stats["nodes"], time.perf_counter() - start, lines[0][1], lines[0][2])
+    clear_caches()
+    return lines
+
+
+def principal_variation(board, color, move, depth):
+    """
+    The expected line of play from board, starting with move, followed
+    through the best moves stored in bound_states (only the first move
+    without caching).
+    """
+    pv = [move]
+    to_move = color
+    seen = set()
+    while len(pv) < depth and pv[-1] is not None:
+        board = play_move(board, to_move, pv[-1][0], pv[-1][1])
+        to_move = get_opp_color(to_move)
+        if board in seen:
+            break
+        seen.add(board)
+        entry = bound_states.get((board, to_move, color))
+        if entry is None or entry[3] is None:
+            break
+        pv.append(entry[3])
+    return pv
+
+
+def report_search(board, color, depth, start, move, value):
+    info_callback(depth, search_stats["nodes"], time.perf_counter() - start, value,
+                  principal_variation(board, color, move, depth))
+
+
+def print_info(depth, nodes, seconds, value, pv):
+    print(encode_info(depth, nodes, seconds, value, pv), flush=True)  # sent right away, not with the move
+
+
+def select_move_timed(board, color, caching=0, ordering=0, clock=None):
+    """
+    Given a board and a player color, decide on a move within the time the
+    game manager allows for it.
+    Runs alpha-beta with iterative deepening (depth 1, 2, ...) and returns the
+    move of the deepest completed iteration. The TimeManager decides whether
+    another iteration is worth starting; an iteration still running at its
+    hard deadline is abandoned.
+    """
+    global search_deadline
+    board = hashable_board(board)
+    if clock is None:
+        clock = TimeManager()
+    clock.start(board, color)
+    move = get_possible_moves(board, color)[0]
+    depth = 1
+    search_deadline = clock.deadline()
+    search_stats["nodes"] = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            move, value = alphabeta_max_node(board, color, float("-inf"), float("inf"), depth, caching, ordering)
+            if info_callback is not None:
+                report_search(board, color, depth, start, move, value)
+            clock.iteration_done(depth, move)
+            depth += 1
+            if not clock.next_iteration(depth):
+                break
+    except SearchTimeout:
+        pass
+    finally:
+        search_deadline = None
+        clear_caches()
     return move
 
 
 ####################################################
+def setup_from_env():
+    """
+    Apply the startup options given in the environment. run_ai calls this
+    once per process, in-process players once per imported agent.
+    """
+    if os.environ.get(SHARED_TT_ENV):  # Share search results with other processes on this host
+        use_shared_table(os.environ[SHARED_TT_ENV])
+        eprint("Using shared transposition table", os.environ[SHARED_TT_ENV])
+    if os.environ.get(PROBCUT_ENV):  # Selective search if a ProbCut model is given
+        load_probcut_model(os.environ[PROBCUT_ENV])
+        eprint("ProbCut is ON for depths", sorted(probcut_model))
+
+
 def run_ai():
     """
     This function establishes communication with the game manager.
@@ -236,63 +581,80 @@ def run_ai():
     Then it repeatedly receives the current score and current board state
     until the game is over.
     """
-    print("Othello AI")  # First line is the name of this AI
-    arguments = input().split(",")
-
-    color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
-    limit = int(arguments[1])  # Depth limit
-    minimax = int(arguments[2])  # Minimax or alpha beta
-    caching = int(arguments[3])  # Caching
-    ordering = int(arguments[4])  # Node-ordering (for alpha-beta only)
-
-    if (minimax == 1):
-        eprint("Running MINIMAX")
-    else:
-        eprint("Running ALPHA-BETA")
-
-    if (caching == 1):
-        eprint("State Caching is ON")
-    else:
-        eprint("State Caching is OFF")
-
-    if (ordering == 1):
-        eprint("Node Ordering is ON")
-    else:
-        eprint("Node Ordering is OFF")
-
-    if (limit == -1):
-        eprint("Depth Limit is OFF")
-    else:
-        eprint("Depth Limit is ", limit)
+    global info_callback
+    print(introduction("Othello AI"))  # First line is the name of this AI and its protocol version
+    setup_from_env()
+
+    setup = input()
+    while setup is not None:  # One game per setup line, the manager may reuse us for more games
+        arguments = setup.split(",")
+
+        color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
+        limit = int(arguments[1])  # Depth limit
+        minimax = int(arguments[2])  # Minimax or alpha beta
+        caching = int(arguments[3])  # Caching
+        ordering = int(arguments[4])  # Node-ordering (for alpha-beta only)
+        version = setup_version(arguments)  # Board format chosen by the manager
+        info_callback = print_info if version >= 5 else None  # Search progress for the manager
+
+        if (minimax == 1):
+            eprint("Running MINIMAX")
+        else:
+            eprint("Running ALPHA-BETA")
 
-    if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+        if (caching == 1):
+            eprint("State Caching is ON")
+        else:
+            eprint("State Caching is OFF")
 
-    while True:  # This is the main loop
-        # Read in the current game status, for example:
-        # "SCORE 2 2" or "FINAL 33 31" if the game is over.
-        # The first number is the score for player 1 (dark), the second for player 2 (light)
-        next_input = input()
-        status, dark_score_s, light_score_s = next_input.strip().split()
-        dark_score = int(dark_score_s)
-        light_score = int(light_score_s)
+        if (ordering == 1):
+            eprint("Node Ordering is ON")
+        else:
+            eprint("Node Ordering is OFF")
 
-        if status == "FINAL":  # Game is over.
-            print
+        if (limit == -1):
+            eprint("Depth Limit is OFF, searching until the move's time is used")
         else:
-            board = eval(input())  # Read in the input and turn it into a Python
-            # object. The format is a list of rows. The
-            # squares in each row are represented by
-            # 0 : empty square
-            # 1 : dark disk (player 1)
-            # 2 : light disk (player 2)
-
-            # Select the move and send it to the manager
-            if (minimax == 1):  # run this if the minimax flag is given
-                movei, movej = select_move_minimax(board, color, limit, caching)
-            else:  # else run alphabeta
-                movei, movej = select_move_alphabeta(board, color, limit, caching, ordering)
-
-            print("{} {}".format(movei, movej))
+            eprint("Depth Limit is ", limit)
+
+        if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+
+        profiler = profiler_from_env()  # Per-move profiling if OTHELLO_PROFILE is set
+        clock = TimeManager()
+
+        board = None
+        while True:  # This is the main loop
+            # Read in the current game status and board, for example:
+            # "SCORE 2 2" or "FINAL 33 31" if the game is over (the scores of dark and light) and the board,
+            # or with protocol 3 just the moves played since our last move (see othello_protocol).
+            status, board = read_position(version, board, color)
+
+            if status == "FINAL":  # Game is over.
+                if profiler is not None:
+                    eprint("Profile summary written to", profiler.finish())
+                if caching == 1:
+                    eprint("ETC probes {probes}, hits {hits}, cutoffs {cutoffs}".format(**etc_stats))
+                break
+            else:
+                # Select the move and send it to the manager
+                if (minimax == 1):  # run this if the minimax flag is given
+                    select_move, args = select_move_minimax, (board, color, limit, caching)
+                elif (limit == -1):  # no depth limit, let the clock decide
+                    select_move, args = select_move_timed, (board, color, caching, ordering, clock)
+                else:  # else run alphabeta
+                    select_move, args = select_move_alphabeta, (board, color, limit, caching, ordering)
+
+                if profiler is not None:
+                    movei, movej = profiler.profile_move(select_move, *args)
+                else:
+                    movei, movej = select_move(*args)
+                if select_move is select_move_timed:
+                    eprint("Searched to depth {} in {:.2f}s".format(len(clock.iteration_times), clock.elapsed()))
+
+                print("{} {}".format(movei, movej))
+                board = play_move(board, color, movei, movej)  # Keep our own board up to date
+
+        setup = next_game(version)  # "RESET <setup>" starts another game, otherwise we are done
 
 
 if __name__ == "__main__":
@@ -2,14 +2,24 @@
 An AI player for Othello.
 """
 
+import os
 import random
 import sys
 import time
 
 # You can use the functions in othello_shared to write your AI
 from othello_shared import find_lines, get_possible_moves, get_score, play_move
+from othello_protocol import introduction, setup_version, read_position, next_game
+from othello_profile import profiler_from_env
+from othello_cache import BoundedCache
+from othello_heuristic import WEIGHTS_ENV, DEFAULT_WEIGHTS, compute_xsquare, compute_edge, load_weights, weighted_sum
 
-caching_states = {}
+# Cached evaluations, least recently used entries are evicted past the budget
+CACHE_MAX_ENTRIES = 500000
+caching_states = BoundedCache(max_entries=CACHE_MAX_ENTRIES)
+
+# Feature weights of compute_heuristic, replaced at startup by the file OTHELLO_WEIGHTS names (see othello_heuristic)
+heuristic_weights = dict(DEFAULT_WEIGHTS)
 
 
 def eprint(*args, **kwargs):  # you can use this for debugging, as it will print to sterr and not stdout
@@ -25,22 +35,26 @@ def get_opp_color(color):
 
 
 # Heuristic Description:
-# The Heuristic is a weighted sum of three parts:
+# The Heuristic is a weighted sum of features (heuristic_features), with the weights in heuristic_weights:
 # the coin difference (compute_utility),
 # the choice difference (compute_choice),
-# the corner difference (compute_corner)
+# the corner difference (compute_corner),
+# and, with tuned weights only, the X-square and edge differences (compute_xsquare, compute_edge in othello_heuristic)
 
 # The coin difference indicates the difference between the color of our coin and the opponent's coin
 # Although this is the utility value of terminal state, it is not an accurate estimate during the game, hence give it
-# a small weight 0.2 in our case
+# a small default weight of 0.2
 
 # The choice difference indicates the difference between the number of possible moves of our coin and the number of
 # possible moves of the opponent's coin This is also an important estimate since the number of moves one can make
-# usually indicate the mobility, hence give it a small weight 0.2 in our case
+# usually indicate the mobility, hence give it a small default weight of 0.2
 
 # The number of occupied corners between our agent and opponent is the most important estimate, since corner
 # positions are the most important locations in the board. This is because they are unchangeable, and tends to be a
-# good place to s start to flip the opponent's coin, hence give it a large weight 0.6 in our case
+# good place to s start to flip the opponent's coin, hence give it a large default weight of 0.7
+
+# The default weights are othello_heuristic.DEFAULT_WEIGHTS; othello_tune.py fits all five weights from self-play
+# positions, and OTHELLO_WEIGHTS=<file> replaces the defaults with them
 
 # Method to compute utility value of each state
 def compute_utility(board, color):
@@ -80,9 +94,13 @@ def compute_corner(board, color):
         return max_corner - min_corner
 
 
+heuristic_features = {"utility": compute_utility, "choice": compute_choice, "corner": compute_corner,
+                      "xsquare": compute_xsquare, "edge": compute_edge}
+
+
 # Better heuristic value of board
 def compute_heuristic(board, color):
-    return 0.2 * compute_utility(board, color) + 0.2 * compute_choice(board, color) + 0.7 * compute_corner(board, color)
+    return weighted_sum(board, color, heuristic_weights, heuristic_features)
 
 
 ############ MINIMAX ###############################
@@ -102,9 +120,10 @@ def minimax_min_node(board, color, limit, caching=0):
     possible_moves = get_possible_moves(board, max_color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
     for move in possible_moves:
@@ -126,9 +145,10 @@ def minimax_max_node(board, color, limit, caching=0):  # returns highest possibl
     #     min_color = 1
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
 
@@ -155,8 +175,7 @@ def select_move_minimax(board, color, limit, caching=0):
     If caching is OFF (i.e. 0), do NOT use state caching to reduce the number of state evaluations.
     """
     move, _ = minimax_max_node(board, color, limit, caching)
-    global caching_states
-    caching_states = {}
+    caching_states.clear()
     # print("moves")
     # print(move)
     return move
@@ -173,9 +192,10 @@ def alphabeta_min_node(board, color, alpha, beta, limit, caching=0, ordering=0):
     possible_moves = get_possible_moves(board, min_color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = -1 * compute_heuristic(board, min_color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = -1 * compute_heuristic(board, min_color)
+            return best_move, value
         else:
             return best_move, -1 * compute_heuristic(board, min_color)
     for move in possible_moves:
@@ -198,9 +218,10 @@ def alphabeta_max_node(board, color, alpha, beta, limit, caching=0, ordering=0):
     possible_moves = get_possible_moves(board, color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
     if ordering:
@@ -242,6 +263,16 @@ def select_move_alphabeta(board, color, limit, caching=0, ordering=0):
 
 
 ####################################################
+def setup_from_env():
+    """
+    Apply the startup options given in the environment. run_ai calls this
+    once per process, in-process players once per imported agent.
+    """
+    if os.environ.get(WEIGHTS_ENV):  # Tuned heuristic weights
+        load_weights(os.environ[WEIGHTS_ENV], heuristic_weights, heuristic_features)
+        eprint("Heuristic weights", heuristic_weights)
+
+
 def run_ai():
     """
     This function establishes communication with the game manager.
@@ -249,63 +280,70 @@ def run_ai():
     Then it repeatedly receives the current score and current board state
     until the game is over.
     """
-    print("Othello AI 2")  # First line is the name of this AI
-    arguments = input().split(",")
-
-    color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
-    limit = int(arguments[1])  # Depth limit
-    minimax = int(arguments[2])  # Minimax or alpha beta
-    caching = int(arguments[3])  # Caching
-    ordering = int(arguments[4])  # Node-ordering (for alpha-beta only)
-
-    if (minimax == 1):
-        eprint("Running MINIMAX")
-    else:
-        eprint("Running ALPHA-BETA")
-
-    if (caching == 1):
-        eprint("State Caching is ON")
-    else:
-        eprint("State Caching is OFF")
-
-    if (ordering == 1):
-        eprint("Node Ordering is ON")
-    else:
-        eprint("Node Ordering is OFF")
-
-    if (limit == -1):
-        eprint("Depth Limit is OFF")
-    else:
-        eprint("Depth Limit is ", limit)
+    print(introduction("Othello AI 2"))  # First line is the name of this AI and its protocol version
+    setup_from_env()
+    setup = input()
+    while setup is not None:  # One game per setup line, the manager may reuse us for more games
+        arguments = setup.split(",")
+
+        color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
+        limit = int(arguments[1])  # Depth limit
+        minimax = int(arguments[2])  # Minimax or alpha beta
+        caching = int(arguments[3])  # Caching
+        ordering = int(arguments[4])  # Node-ordering (for alpha-beta only)
+        version = setup_version(arguments)  # Board format chosen by the manager
+
+        if (minimax == 1):
+            eprint("Running MINIMAX")
+        else:
+            eprint("Running ALPHA-BETA")
 
-    if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+        if (caching == 1):
+            eprint("State Caching is ON")
+        else:
+            eprint("State Caching is OFF")
 
-    while True:  # This is the main loop
-        # Read in the current game status, for example:
-        # "SCORE 2 2" or "FINAL 33 31" if the game is over.
-        # The first number is the score for player 1 (dark), the second for player 2 (light)
-        next_input = input()
-        status, dark_score_s, light_score_s = next_input.strip().split()
-        dark_score = int(dark_score_s)
-        light_score = int(light_score_s)
+        if (ordering == 1):
+            eprint("Node Ordering is ON")
+        else:
+            eprint("Node Ordering is OFF")
 
-        if status == "FINAL":  # Game is over.
-            print
+        if (limit == -1):
+            eprint("Depth Limit is OFF")
         else:
-            board = eval(input())  # Read in the input and turn it into a Python
-            # object. The format is a list of rows. The
-            # squares in each row are represented by
-            # 0 : empty square
-            # 1 : dark disk (player 1)
-            # 2 : light disk (player 2)
-
-            # Select the move and send it to the manager
-            if (minimax == 1):  # run this if the minimax flag is given
-                movei, movej = select_move_minimax(board, color, limit, caching)
-            else:  # else run alphabeta
-                movei, movej = select_move_alphabeta(board, color, limit, caching, ordering)
-
-            print("{} {}".format(movei, movej))
+            eprint("Depth Limit is ", limit)
+
+        if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+
+        profiler = profiler_from_env()  # Per-move profiling if OTHELLO_PROFILE is set
+
+        board = None
+        while True:  # This is the main loop
+            # Read in the current game status and board, for example:
+            # "SCORE 2 2" or "FINAL 33 31" if the game is over (the scores of dark and light) and the board,
+            # or with protocol 3 just the moves played since our last move (see othello_protocol).
+            status, board = read_position(version, board, color)
+
+            if status == "FINAL":  # Game is over.
+                if profiler is not None:
+                    eprint("Profile summary written to", profiler.finish())
+                break
+            else:
+                # Select the move and send it to the manager
+                if (minimax == 1):  # run this if the minimax flag is given
+                    select_move, args = select_move_minimax, (board, color, limit, caching)
+                else:  # else run alphabeta
+                    select_move, args = select_move_alphabeta, (board, color, limit, caching, ordering)
+
+                if profiler is not None:
+                    movei, movej = profiler.profile_move(select_move, *args)
+                else:
+                    movei, movej = select_move(*args)
+
+                print("{} {}".format(movei, movej))
+                board = play_move(board, color, movei, movej)  # Keep our own board up to date
+
+        setup = next_game(version)  # "RESET <setup>" starts another game, otherwise we are done
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
+import os
 import random
 import sys
 import time
 
 # You can use the functions in othello_shared to write your AI for competition
 from othello_shared import find_lines, get_possible_moves, get_score, play_move
+from othello_protocol import introduction, setup_version, read_position, next_game
+from othello_profile import profiler_from_env
+from othello_cache import BoundedCache
+from othello_heuristic import WEIGHTS_ENV, DEFAULT_WEIGHTS, compute_xsquare, compute_edge, load_weights, weighted_sum
 
 # # If you choose to try MCTS, you can make use of the code below
 # class MCTS_state():
@@ -40,7 +45,12 @@ import time
 # You can use the functions in othello_shared to write your AI
 from othello_shared import find_lines, get_possible_moves, get_score, play_move
 
-caching_states = {}
+# Cached evaluations, least recently used entries are evicted past the budget
+CACHE_MAX_ENTRIES = 500000
+caching_states = BoundedCache(max_entries=CACHE_MAX_ENTRIES)
+
+# Feature weights of compute_heuristic, replaced at startup by the file OTHELLO_WEIGHTS names (see othello_heuristic)
+heuristic_weights = dict(DEFAULT_WEIGHTS)
 
 
 def eprint(*args, **kwargs):  # you can use this for debugging, as it will print to sterr and not stdout
@@ -56,11 +66,16 @@ def compute_utility(board, color):
     return utility
 
 
-def compute_choice(board, color):
-    if color == 0:
-        opponent = 1
+def get_opp_color(color):
+    if color == 1:
+        opponent = 2
     else:
-        opponent = 0
+        opponent = 1
+    return opponent
+
+
+def compute_choice(board, color):
+    opponent = get_opp_color(color)
     max_choice = len(get_possible_moves(board, color))
     min_choice = len(get_possible_moves(board, opponent))
     if max_choice == 0 and min_choice == 0:
@@ -70,10 +85,7 @@ def compute_choice(board, color):
 
 
 def compute_corner(board, color):
-    if color == 0:
-        opponent = 1
-    else:
-        opponent = 0
+    opponent = get_opp_color(color)
     corners = [(0, 0), (0, len(board) - 1), (len(board) - 1, 0), (len(board) - 1, len(board) - 1)]
     max_corner = 0
     min_corner = 0
@@ -89,9 +101,13 @@ def compute_corner(board, color):
         return max_corner - min_corner
 
 
+heuristic_features = {"utility": compute_utility, "choice": compute_choice, "corner": compute_corner,
+                      "xsquare": compute_xsquare, "edge": compute_edge}
+
+
 # Better heuristic value of board
 def compute_heuristic(board, color):
-    return 0.2 * compute_utility(board, color) + 0.2 * compute_choice(board, color) + 0.7 * compute_corner(board, color)
+    return weighted_sum(board, color, heuristic_weights, heuristic_features)
 
 
 ############ MINIMAX ###############################
@@ -111,9 +127,10 @@ def minimax_min_node(board, color, limit, caching=0):
     possible_moves = get_possible_moves(board, max_color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
     for move in possible_moves:
@@ -135,9 +152,10 @@ def minimax_max_node(board, color, limit, caching=0):  # returns highest possibl
     #     min_color = 1
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
 
@@ -164,8 +182,7 @@ def select_move_minimax(board, color, limit, caching=0):
     If caching is OFF (i.e. 0), do NOT use state caching to reduce the number of state evaluations.
     """
     move, _ = minimax_max_node(board, color, limit, caching)
-    global caching_states
-    caching_states = {}
+    caching_states.clear()
     # print("moves")
     # print(move)
     return move
@@ -182,9 +199,10 @@ def alphabeta_min_node(board, color, alpha, beta, limit, caching=0, ordering=0):
     possible_moves = get_possible_moves(board, min_color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = -1 * compute_heuristic(board, min_color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = -1 * compute_heuristic(board, min_color)
+            return best_move, value
         else:
             return best_move, -1 * compute_heuristic(board, min_color)
     for move in possible_moves:
@@ -207,9 +225,10 @@ def alphabeta_max_node(board, color, alpha, beta, limit, caching=0, ordering=0):
     possible_moves = get_possible_moves(board, color)
     if possible_moves == [] or limit == 0:
         if caching:
-            if board not in caching_states:
-                caching_states[board] = compute_heuristic(board, color)
-            return best_move, caching_states[board]
+            value = caching_states.get(board)
+            if value is None:
+                value = caching_states[board] = compute_heuristic(board, color)
+            return best_move, value
         else:
             return best_move, compute_heuristic(board, color)
     if ordering:
@@ -250,50 +269,67 @@ def select_move_alphabeta(board, color, limit, caching=0, ordering=0):
     return move
 
 
-def run_ai():
+def setup_from_env():
     """
-        Please do not modify this part.
-        """
-    print("Othello AI")  # First line is the name of this AI
-    arguments = input().split(",")
-
-    color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
-    limit = int(arguments[1])  # Iteration limit
-    minimax = int(arguments[2])  # not used here
-    caching = int(arguments[3])  # not used here
-    ordering = int(arguments[4])  # not used here
-
-    if (limit == -1):
-        eprint("Iteration Limit is OFF")
-    else:
-        eprint("Iteration Limit is ", limit)
-
-    if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+    Apply the startup options given in the environment. run_ai calls this
+    once per process, in-process players once per imported agent.
+    """
+    if os.environ.get(WEIGHTS_ENV):  # Tuned heuristic weights
+        load_weights(os.environ[WEIGHTS_ENV], heuristic_weights, heuristic_features)
+        eprint("Heuristic weights", heuristic_weights)
 
-    while True:  # This is the main loop
-        # Read in the current game status, for example:
-        # "SCORE 2 2" or "FINAL 33 31" if the game is over.
-        # The first number is the score for player 1 (dark), the second for player 2 (light)
-        next_input = input()
-        status, dark_score_s, light_score_s = next_input.strip().split()
-        dark_score = int(dark_score_s)
-        light_score = int(light_score_s)
 
-        if status == "FINAL":  # Game is over.
-            print
+def run_ai():
+    """
+    This function establishes communication with the game manager: it
+    introduces itself, applies the startup options in the environment
+    (setup_from_env) and then plays one game per setup line it receives.
+    """
+    print(introduction("Othello AI"))  # First line is the name of this AI and its protocol version
+    setup_from_env()
+    setup = input()
+    while setup is not None:  # One game per setup line, the manager may reuse us for more games
+        arguments = setup.split(",")
+
+        color = int(arguments[0])  # Player color: 1 for dark (goes first), 2 for light.
+        limit = int(arguments[1])  # Iteration limit
+        minimax = int(arguments[2])  # not used here
+        caching = int(arguments[3])  # not used here
+        ordering = int(arguments[4])  # not used here
+        version = setup_version(arguments)  # Board format chosen by the manager
+
+        if (limit == -1):
+            eprint("Iteration Limit is OFF")
         else:
-            board = eval(input())  # Read in the input and turn it into a Python
-            # object. The format is a list of rows. The
-            # squares in each row are represented by
-            # 0 : empty square
-            # 1 : dark disk (player 1)
-            # 2 : light disk (player 2)
-
-            # Uncomment the line below if you choose to use MCTS
-            # movei, movej = select_move_MCTS(board, color, limit)
-
-            # Otherwise, use whatever formulation you like! e.g.:
-            # movei, movej = select_move_minimax(board, color, limit, caching)
-            movei, movej = select_move_alphabeta(board, color, limit, caching, ordering)
-
-            print("{} {}".format(movei, movej))
+            eprint("Iteration Limit is ", limit)
+
+        if (minimax == 1 and ordering == 1): eprint("Node Ordering should have no impact on Minimax")
+
+        profiler = profiler_from_env()  # Per-move profiling if OTHELLO_PROFILE is set
+
+        board = None
+        while True:  # This is the main loop
+            # Read in the current game status and board, for example:
+            # "SCORE 2 2" or "FINAL 33 31" if the game is over (the scores of dark and light) and the board,
+            # or with protocol 3 just the moves played since our last move (see othello_protocol).
+            status, board = read_position(version, board, color)
+
+            if status == "FINAL":  # Game is over.
+                if profiler is not None:
+                    eprint("Profile summary written to", profiler.finish())
+                break
+            else:
+                # Uncomment the line below if you choose to use MCTS
+                # movei, movej = select_move_MCTS(board, color, limit)
+
+                # Otherwise, use whatever formulation you like! e.g.:
+                # movei, movej = select_move_minimax(board, color, limit, caching)
+                if profiler is not None:
+                    movei, movej = profiler.profile_move(select_move_alphabeta, board, color, limit, caching, ordering)
+                else:
+                    movei, movej = select_move_alphabeta(board, color, limit, caching, ordering)
+
+                print("{} {}".format(movei, movej))
+                board = play_move(board, color, movei, movej)  # Keep our own board up to date
+
+        setup = next_game(version)  # "RESET <setup>" starts another game, otherwise we are done
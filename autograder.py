@@ -1,26 +1,11 @@
 #!/usr/bin/env python
-import os  # for time functions
 
 # import student's functions
 from agent import *
+from othello_positions import smallboards, bigboards
+from othello_bench import measure_interleaved, median
 
-smallboards = [((0, 0, 0, 0), (0, 2, 1, 0), (0, 1, 1, 1), (0, 0, 0, 0)),
-               ((0, 1, 0, 0), (0, 1, 1, 0), (0, 1, 2, 1), (0, 0, 0, 2)),
-               ((0, 0, 0, 0), (0, 2, 1, 0), (0, 1, 1, 1), (0, 1, 1, 0)),
-               ((0, 1, 0, 0), (0, 2, 2, 0), (0, 1, 2, 1), (0, 0, 2, 2)),
-               ((1, 0, 0, 2), (1, 1, 2, 0), (1, 1, 1, 1), (1, 2, 2, 2)),
-               ((0, 1, 0, 0), (0, 1, 1, 0), (2, 2, 2, 1), (0, 0, 0, 2))]
-
-bigboards = [((0, 0, 0, 0, 0, 0), (0, 0, 2, 2, 0, 0), (0, 1, 1, 2, 2, 0), (2, 2, 1, 2, 0, 0), (0, 1, 0, 1, 2, 0),
-              (0, 0, 0, 0, 0, 0)),
-             ((0, 0, 0, 0, 0, 0), (0, 0, 1, 2, 0, 0), (0, 1, 1, 1, 1, 0), (2, 2, 1, 2, 0, 0), (0, 1, 0, 1, 2, 0),
-              (0, 0, 0, 0, 0, 0)),
-             ((0, 0, 0, 0, 1, 0), (0, 0, 1, 1, 0, 0), (0, 1, 1, 1, 1, 0), (2, 2, 1, 2, 0, 0), (0, 2, 0, 1, 2, 0),
-              (0, 0, 2, 2, 1, 0)),
-             ((0, 0, 0, 0, 0, 0), (0, 0, 0, 2, 0, 0), (0, 1, 2, 2, 2, 0), (0, 2, 2, 2, 0, 0), (0, 1, 0, 0, 0, 0),
-              (0, 0, 0, 0, 0, 0)),
-             ((0, 0, 0, 0, 0, 0), (0, 0, 0, 2, 0, 0), (0, 1, 2, 1, 1, 0), (0, 2, 2, 2, 0, 0), (0, 1, 0, 0, 0, 0),
-              (0, 0, 0, 0, 0, 0))]
+BENCH_REPEAT = 5  # timed runs per configuration, alternating between the two; the medians are compared
 
 # Select what to test
 test_compute_utility = True
@@ -102,15 +87,12 @@ if test_caching_big:
     check_2 = 0
     for i in range(0, len(bigboards)):
 
-        start_time_1 = os.times()[0]
-        no_cache = select_move_alphabeta(bigboards[i], 1, 6)
-        end_time_1 = os.times()[0]
+        run_1, run_2 = measure_interleaved([(select_move_alphabeta, (bigboards[i], 1, 6)),
+                                            (select_move_alphabeta, (bigboards[i], 1, 6, 1))], BENCH_REPEAT)
+        no_cache = run_1["result"]
+        with_cache = run_2["result"]
 
-        start_time_2 = os.times()[0]
-        with_cache = select_move_alphabeta(bigboards[i], 1, 6, 1)
-        end_time_2 = os.times()[0]
-
-        if (end_time_1 - start_time_1) >= (end_time_2 - start_time_2):
+        if median(run_1["cpu"]) >= median(run_2["cpu"]):
             check_1 += 1
 
         if (with_cache == no_cache):
@@ -126,15 +108,12 @@ if test_ordering:
     check_2 = 0
     for i in range(0, len(bigboards)):
 
-        start_time_1 = os.times()[0]
-        no_order = select_move_alphabeta(bigboards[i], 1, 6, 0, 0)
-        end_time_1 = os.times()[0]
-
-        start_time_2 = os.times()[0]
-        with_order = select_move_alphabeta(bigboards[i], 1, 6, 0, 1)
-        end_time_2 = os.times()[0]
+        run_1, run_2 = measure_interleaved([(select_move_alphabeta, (bigboards[i], 1, 6, 0, 0)),
+                                            (select_move_alphabeta, (bigboards[i], 1, 6, 0, 1))], BENCH_REPEAT)
+        no_order = run_1["result"]
+        with_order = run_2["result"]
 
-        if (end_time_1 - start_time_1) >= (end_time_2 - start_time_2):
+        if median(run_1["cpu"]) >= median(run_2["cpu"]):
             check_1 += 1
 
         if (with_order == no_order):
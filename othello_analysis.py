@@ -0,0 +1,107 @@
+"""
+This module contains a background analysis engine that scores every legal
+move of a position with an agent's alpha-beta search.
+
+The engine imports its own copy of the agent (see load_agent_module), so it
+never shares caches with a player. A worker thread deepens the search one
+level at a time and reports the scores after every level; when another
+position is asked for, the running search is stopped at its next node
+through the agent's search_deadline. Results are kept per position, so
+going back to a position that was already analysed reports its scores
+right away and deepens from there. The agent must have agent.py's
+search_deadline, SearchTimeout and clear_caches.
+
+    engine = AnalysisEngine("agent.py", report)
+    engine.analyse(board, color)   # report(board, color, depth, scores) is called from the worker
+    engine.stop()
+"""
+
+import threading
+
+from othello_game import load_agent_module
+from othello_shared import get_possible_moves, play_move
+from othello_cache import BoundedCache
+
+MAX_POSITIONS = 10000 # analysed positions kept
+
+
+class AnalysisEngine(object):
+
+    def __init__(self, filename, report, max_depth=None, caching=1, ordering=0):
+        """
+        report(board, color, depth, scores) is called on the worker thread
+        with scores a dict move -> value for color, after every completed
+        depth. max_depth None deepens until the end of the game.
+        """
+        self.module = load_agent_module(filename)
+        self.report = report
+        self.max_depth = max_depth
+        self.caching = caching
+        self.ordering = ordering
+        self.results = BoundedCache(max_entries=MAX_POSITIONS) # (board, color) -> (depth, scores)
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.position = None
+        self.generation = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def analyse(self, board, color):
+        """
+        Analyse a new position, abandoning the current one.
+        """
+        board = tuple(tuple(row) for row in board)
+        with self.lock:
+            self.position = (board, color)
+            self.generation += 1
+            self.module.search_deadline = 0  # stops a running search at its next node
+            self.wake.notify()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.position = None
+            self.module.search_deadline = 0
+            self.wake.notify()
+
+    def current(self, generation):
+        with self.lock:
+            return self.running and generation == self.generation
+
+    def run(self):
+        while True:
+            with self.lock:
+                while self.running and self.position is None:
+                    self.wake.wait()
+                if not self.running:
+                    return
+                board, color = self.position
+                generation = self.generation
+                self.position = None
+                self.module.search_deadline = None
+            try:
+                self.deepen(board, color, generation)
+            except self.module.SearchTimeout:
+                pass
+
+    def deepen(self, board, color, generation):
+        moves = get_possible_moves(board, color)
+        if not moves:
+            return
+        depth, scores = self.results.get((board, color), (0, {}))
+        if depth:
+            self.report(board, color, depth, scores)
+        empties = sum(row.count(0) for row in board)
+        last = empties if self.max_depth is None else min(self.max_depth, empties)
+        self.module.clear_caches()
+        while depth < last and self.current(generation):
+            depth += 1
+            scores = {}
+            for move in moves:
+                child = play_move(board, color, move[0], move[1])
+                _, scores[move] = self.module.alphabeta_min_node(child, color, float("-inf"), float("inf"),
+                                                                 depth - 1, self.caching, self.ordering)
+            self.results[(board, color)] = (depth, scores)
+            if self.current(generation):
+                self.report(board, color, depth, scores)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains an asyncio version of the game manager, so that one
+process can supervise many games at once instead of one manager process per
+game blocking on its AIs' pipes.
+
+AsyncAiPlayerInterface talks to an AI process started with
+asyncio.create_subprocess_exec and enforces the move timeout with
+asyncio.wait_for; play_game_async is play_game for async players. The board
+bookkeeping is the same OthelloGameManager.
+
+    python3 othello_async.py -a agent.py -a randy_ai.py -d 6 -n 200 -j 100 -l 3
+
+plays the games with up to 100 running at once and reports how late the
+event loop was in waking up (its scheduling lag), which should stay flat as
+the number of concurrent games grows.
+"""
+import sys, getopt
+import asyncio
+import os
+import subprocess
+import time
+
+from othello_game import OthelloGameManager, AiPlayerInterface, AiTimeoutError, InvalidMoveError, GameResult
+from othello_shared import get_score
+from othello_protocol import parse_introduction, negotiate, encode_board, parse_info
+from othello_tournament import schedule, result_row, record_row, ResultWriter, summarize, print_summary
+from othello_record import RecordWriter
+
+LAG_INTERVAL = 0.05 # seconds between event loop lag samples
+
+
+class AsyncAiPlayerInterface(AiPlayerInterface):
+    """
+    AiPlayerInterface on asyncio streams. Create players with
+    "await AsyncAiPlayerInterface.create(...)"; get_move and kill are
+    coroutines.
+    """
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    async def create(cls, filename, color, limit, minimax = False, caching = False, ordering = False):
+        player = cls()
+        await player.start(filename)
+        player.configure(color, limit, minimax, caching, ordering)
+        return player
+
+    async def start(self, filename):
+        self.process = await asyncio.create_subprocess_exec('python3', filename, stdin=subprocess.PIPE,
+                                                            stdout=subprocess.PIPE, stderr=AiPlayerInterface.STDERR)
+        self.latencies = [] # seconds from sending each position to receiving the move
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), AiPlayerInterface.TIMEOUT)
+        except asyncio.TimeoutError:
+            line = b""
+        if not line:
+            if self.process.returncode is None:
+                self.process.kill()
+            await self.process.wait()
+            raise ValueError("no introduction from {}".format(filename))
+        name, version = parse_introduction(line.decode("ASCII"))
+        self.name = name
+        self.protocol = negotiate(version, self.on_info is not None)
+
+    def send(self, line):
+        # Buffered by the transport; get_move drains it before waiting for the AI.
+        self.process.stdin.write((line + "\n").encode("ASCII"))
+
+    def timeout(self):
+        sys.stderr.write("{} timed out.\n".format(self.name))
+        self.process.kill()
+        self.timed_out = True
+
+    async def read_move(self, manager):
+        move_s = (await self.process.stdout.readline()).decode("ASCII")
+        if move_s.strip() == "RESYNC": # the AI's own board is out of date
+            self.send("BOARD " + encode_board(manager.board, 2))
+            await self.process.stdin.drain()
+            move_s = (await self.process.stdout.readline()).decode("ASCII")
+        while move_s.startswith("INFO "): # search progress (protocol 5)
+            if self.on_info is not None:
+                self.on_info(parse_info(move_s))
+            move_s = (await self.process.stdout.readline()).decode("ASCII")
+        return move_s
+
+    async def get_move(self, manager):
+        self.send_position(manager)
+        await self.process.stdin.drain()
+        start = time.perf_counter()
+        reading = asyncio.ensure_future(self.read_move(manager))
+        done, _ = await asyncio.wait([reading], timeout=AiPlayerInterface.SOFT_TIMEOUT)
+        if not done:
+            sys.stderr.write("{} is slow: no move after {:.1f}s.\n".format(self.name, time.perf_counter() - start))
+        try:
+            move_s = await asyncio.wait_for(reading, max(0, start + AiPlayerInterface.TIMEOUT - time.perf_counter()))
+        except asyncio.TimeoutError:
+            self.timeout()
+            raise AiTimeoutError
+        self.latencies.append(time.perf_counter() - start)
+        i_s, j_s = move_s.strip().split()
+        self.seen_moves = len(manager.moves) + 1 # the AI has played this move on its own board
+        return int(i_s), int(j_s)
+
+    async def kill(self, manager):
+        if self.finish(manager):
+            try:
+                self.process.stdin.close() # end of input, so a protocol 4 AI stops waiting for RESET
+                await asyncio.wait_for(self.process.wait(), AiPlayerInterface.FINAL_GRACE)
+            except (OSError, asyncio.TimeoutError):
+                pass
+        if self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+
+
+async def play_game_async(game, player1, player2, verbose = False):
+    """
+    play_game for AsyncAiPlayerInterface players. Returns a GameResult.
+    """
+    players = [None, player1, player2]
+    think_time = [None, 0.0, 0.0]
+    timed_out = None
+
+    try:
+        while True:
+            player_obj = players[game.current_player]
+            if not game.get_possible_moves():
+                break
+            color = "dark" if game.current_player == 1 else "light"
+            start = time.perf_counter()
+            try:
+                i, j = await player_obj.get_move(game)
+            except AiTimeoutError:
+                timed_out = game.current_player
+                if verbose: print("{} ({}) timed out!".format(player_obj.name, color))
+                break
+            think_time[game.current_player] += time.perf_counter() - start
+            if verbose: print("{} ({}) plays {},{}".format(player_obj.name, color, i, j))
+            game.play(i, j)
+    finally:
+        await asyncio.gather(player1.kill(game), player2.kill(game))
+
+    p1score, p2score = get_score(game.board)
+    if verbose: print("FINAL: {} (dark) {}:{} {} (light)".format(player1.name, p1score, p2score, player2.name))
+    return GameResult(p1score, p2score, timed_out, think_time, list(game.moves))
+
+
+async def run_game_async(task, settings, slots):
+    """
+    Play one scheduled game once one of the slots is free and return its
+    result row.
+    """
+    number, size, dark, light = task
+    async with slots:
+        game = OthelloGameManager(size)
+        error = ""
+        options = (settings["limit"], settings["minimax"], settings["caching"], settings["ordering"])
+        players = await asyncio.gather(AsyncAiPlayerInterface.create(dark, 1, *options),
+                                       AsyncAiPlayerInterface.create(light, 2, *options), return_exceptions=True)
+        failed = [color for color, player in ((1, players[0]), (2, players[1])) if isinstance(player, Exception)]
+        if failed:
+            # An AI that cannot be started loses the game, as an unreadable move would.
+            for player in players:
+                if not isinstance(player, Exception):
+                    await player.kill(game)
+            e = players[failed[0] - 1]
+            if not isinstance(e, (ValueError, OSError)):
+                raise e
+            error = "{} ({}): {}".format(dark if failed[0] == 1 else light, failed[0], e)
+            dark_score, light_score = (0, 1) if failed[0] == 1 else (1, 0)
+            return result_row(task, game, dark_score, light_score, None, [None, 0.0, 0.0], error)
+        player1, player2 = players
+        try:
+            result = await play_game_async(game, player1, player2)
+            dark_score, light_score, timed_out = result.dark_score, result.light_score, result.timed_out
+            think_time = result.think_time
+        except (InvalidMoveError, ValueError, OSError) as e:
+            # An illegal or unreadable move loses the game for the player to move.
+            timed_out = None
+            error = "{} ({}): {}".format(dark if game.current_player == 1 else light, game.current_player, e)
+            dark_score, light_score = (0, 1) if game.current_player == 1 else (1, 0)
+            think_time = [None, 0.0, 0.0]
+    return result_row(task, game, dark_score, light_score, timed_out, think_time, error)
+
+
+async def measure_lag(samples):
+    """
+    Append how late each periodic wake-up of the event loop is, in seconds,
+    until cancelled.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(time.perf_counter() - start - LAG_INTERVAL)
+
+
+async def run_games(tasks, settings, concurrency, writer=None, recorder=None):
+    slots = asyncio.Semaphore(concurrency)
+    lag = []
+    monitor = asyncio.ensure_future(measure_lag(lag))
+    results = []
+    for finished in asyncio.as_completed([run_game_async(task, settings, slots) for task in tasks]):
+        row = await finished
+        results.append(row)
+        if writer is not None:
+            writer.write(row)
+        if recorder is not None:
+            record_row(recorder, row)
+        print("game {:>5}/{}  {} {}:{} {}{}".format(
+            len(results), len(tasks), os.path.basename(row["dark"]), row["dark_score"],
+            row["light_score"], os.path.basename(row["light"]),
+            "  (timeout)" if row["timed_out"] else ("  (error)" if row["error"] else "")), file=sys.stderr)
+    monitor.cancel()
+    return results, lag
+
+
+def main(argv):
+
+    usage = 'othello_async.py -a <agent> -a <agent> [-a ...] [-g] [-d <size,...>] [-n <games per pairing>] [-l <depth-limit> -c -o -m] [-j <concurrent games>] [-f <results.csv|.jsonl>] [-r <games.othr>]'
+    agents = []
+    sizes = [6]
+    games = 2
+    gauntlet = False
+    concurrency = 64
+    output = None
+    records = None
+    settings = {"limit": 4, "minimax": False, "caching": False, "ordering": False}
+
+    try:
+        opts, args = getopt.getopt(argv, "ha:gd:n:l:cmoj:f:r:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-a":
+            agents.append(arg)
+        elif opt == "-g":
+            gauntlet = True
+        elif opt == "-d":
+            sizes = [int(x) for x in arg.split(",")]
+        elif opt == "-n":
+            games = int(arg)
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-c":
+            settings["caching"] = True
+        elif opt == "-m":
+            settings["minimax"] = True
+        elif opt == "-o":
+            settings["ordering"] = True
+        elif opt == "-j":
+            concurrency = int(arg)
+        elif opt == "-f":
+            output = arg
+        elif opt == "-r":
+            records = arg
+
+    if len(agents) < 2:
+        print(usage)
+        sys.exit(2)
+
+    AiPlayerInterface.STDERR = subprocess.DEVNULL
+    tasks = schedule(agents, sizes, games, gauntlet)
+    writer = ResultWriter(output) if output else None
+    recorder = RecordWriter(records) if records else None
+    start = time.perf_counter()
+    results, lag = asyncio.run(run_games(tasks, settings, concurrency, writer, recorder))
+    if writer is not None:
+        writer.close()
+    if recorder is not None:
+        recorder.close()
+
+    print("{} games in {:.1f}s, up to {} at once".format(len(results), time.perf_counter() - start, concurrency))
+    if lag:
+        lag.sort()
+        print("event loop lag: median {:.1f}ms, 99th percentile {:.1f}ms, max {:.1f}ms".format(
+            1000 * lag[len(lag) // 2], 1000 * lag[min(len(lag) - 1, len(lag) * 99 // 100)], 1000 * lag[-1]))
+    print_summary(summarize(results))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module analyses a file of positions with an agent's search and writes
+one JSON line per position, in input order.
+
+Each input line is a board as in protocol 2 (n*n digits, row by row), the
+color to move and an optional id, e.g.
+
+    000000000000002100001200000000000000 1 opening-1
+
+Blank lines and lines starting with # are skipped. Positions are searched by
+a process pool, each worker with its own copy of the agent, to a fixed depth
+(-l) or for a fixed time per position (-t). Only a bounded window of
+positions is in flight at once, so arbitrarily large inputs (or an endless
+stdin) run in constant memory, and results are printed as soon as every
+position before them is done:
+
+    python3 othello_batch.py -a agent.py -l 5 -c positions.txt > results.jsonl
+    cat positions.txt | python3 othello_batch.py -t 2 -j 8
+"""
+import sys, getopt
+import collections
+import json
+import os
+import time
+import multiprocessing
+
+from othello_game import load_agent_module
+from othello_protocol import decode_board
+from othello_shared import get_possible_moves
+from othello_clock import FixedTimeManager
+
+agent = None
+last_report = {}
+
+
+def init_worker(filename):
+    global agent
+    agent = load_agent_module(filename)
+    if hasattr(agent, "info_callback"):
+        agent.info_callback = record_report
+
+
+def record_report(depth, nodes, seconds, value, pv):
+    last_report.update(depth=depth, nodes=nodes, score=value, pv=pv)
+
+
+def parse_position(line):
+    """
+    Return (board, color, id) from an input line.
+    """
+    fields = line.split()
+    board = decode_board(fields[0], 2)
+    if len(board) * len(board) != len(fields[0]):
+        raise ValueError("Board is not square: {}".format(fields[0]))
+    color = int(fields[1]) if len(fields) > 1 else 1
+    if color not in (1, 2):
+        raise ValueError("Color must be 1 or 2: {}".format(fields[1]))
+    return board, color, fields[2] if len(fields) > 2 else None
+
+
+def analyse(args):
+    """
+    Search one input line and return its result dict.
+    """
+    number, line, settings = args
+    result = {"line": number}
+    try:
+        board, color, name = parse_position(line)
+    except (ValueError, IndexError) as e:
+        result["error"] = str(e)
+        return result
+    if name is not None:
+        result["id"] = name
+    if not get_possible_moves(board, color):
+        result["error"] = "no legal move"
+        return result
+    last_report.clear()
+    start = time.perf_counter()
+    if settings["time"] is not None:
+        clock = FixedTimeManager(settings["time"])
+        move = agent.select_move_timed(board, color, settings["caching"], settings["ordering"], clock)
+    else:
+        move = agent.select_move_alphabeta(board, color, settings["limit"], settings["caching"], settings["ordering"])
+    result["time"] = round(time.perf_counter() - start, 4)
+    result["best"] = list(move)
+    result.update((key, last_report[key]) for key in ("depth", "score", "nodes") if key in last_report)
+    if "pv" in last_report:
+        result["pv"] = [list(m) for m in last_report["pv"]]
+    return result
+
+
+def read_tasks(lines, settings):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield number, line, settings
+
+
+def main(argv):
+
+    usage = 'othello_batch.py [-a <agent>] [-l <depth-limit> | -t <seconds per position>] [-c -o] [-j <workers>] [-w <window>] [-f <output.jsonl>] [<positions file>]'
+    filename = "agent.py"
+    workers = os.cpu_count() or 1
+    window = None
+    output = None
+    settings = {"limit": 4, "time": None, "caching": 0, "ordering": 0}
+
+    try:
+        opts, args = getopt.getopt(argv, "ha:l:t:coj:w:f:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-a":
+            filename = arg
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-t":
+            settings["time"] = float(arg)
+        elif opt == "-c":
+            settings["caching"] = 1
+        elif opt == "-o":
+            settings["ordering"] = 1
+        elif opt == "-j":
+            workers = int(arg)
+        elif opt == "-w":
+            window = int(arg)
+        elif opt == "-f":
+            output = arg
+
+    source = open(args[0]) if args else sys.stdin
+    out = open(output, "w") if output else sys.stdout
+    window = window or 4 * workers  # positions in flight; keeps every worker busy
+    pending = collections.deque()
+
+    def emit(number, async_result):
+        try:
+            result = async_result.get()
+        except Exception as e:  # a failed search still gets its line, so the output stays aligned with the input
+            result = {"line": number, "error": "{}: {}".format(type(e).__name__, e)}
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(filename,)) as pool:
+        for task in read_tasks(source, settings):
+            pending.append((task[0], pool.apply_async(analyse, (task,))))
+            if len(pending) >= window:
+                emit(*pending.popleft())
+        while pending:
+            emit(*pending.popleft())
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
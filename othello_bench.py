@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module benchmarks an agent's select_move_alphabeta on fixed position
+sets and compares benchmark runs with a significance test.
+
+Suites (see othello_positions):
+  small      the autograder's 4x4 boards
+  big        the autograder's 6x6 boards
+  generated  random reachable positions (-d size, -n count, -S seed)
+
+Every position is searched warmup times unmeasured, then repeat times with
+wall (perf_counter) and CPU (process_time) time and, for agents that count
+them, nodes recorded. Each timing is reported as its median with a
+distribution-free confidence interval. Results can be written as JSON (-f).
+
+Compare mode tests every position's wall times of a new run against a
+baseline with the Mann-Whitney U test, and flags slowdowns that are
+significant at -p (the exit status is 1 if there are any):
+
+    python3 othello_bench.py -s big,generated -l 5 -c -f new.json
+    python3 othello_bench.py -s big,generated -l 5 -c -C base.json
+    python3 othello_bench.py -a agent.py -b agent2.py -s big -l 4
+"""
+import sys, getopt
+import json
+import math
+import time
+
+from othello_game import load_agent_module
+from othello_positions import smallboards, bigboards, random_positions
+
+CONFIDENCE = 0.95
+
+
+def measure(func, args, repeat=5, warmup=1, counter=None):
+    """
+    Call func(*args) warmup + repeat times and return a dict with its last
+    result and the wall and cpu seconds (and counter["nodes"] after each
+    call, if a counter is given) of the measured calls.
+    """
+    for _ in range(warmup):
+        func(*args)
+    run = {"result": None, "wall": [], "cpu": [], "nodes": [] if counter is not None else None}
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        run["result"] = func(*args)
+        run["cpu"].append(time.process_time() - cpu)
+        run["wall"].append(time.perf_counter() - wall)
+        if counter is not None:
+            run["nodes"].append(counter["nodes"])
+    return run
+
+
+def measure_interleaved(calls, repeat=5, warmup=1):
+    """
+    measure for several (func, args) calls at once, alternating between
+    them on every round so that a drift in machine speed affects all of
+    them alike. Returns one run dict per call.
+    """
+    for _ in range(warmup):
+        for func, args in calls:
+            func(*args)
+    runs = [{"result": None, "wall": [], "cpu": [], "nodes": None} for _ in calls]
+    for _ in range(repeat):
+        for run, (func, args) in zip(runs, calls):
+            one = measure(func, args, 1, 0)
+            run["result"] = one["result"]
+            run["wall"] += one["wall"]
+            run["cpu"] += one["cpu"]
+    return runs
+
+
+def median(samples):
+    xs = sorted(samples)
+    n = len(xs)
+    return xs[n // 2] if n % 2 else (xs[n // 2 - 1] + xs[n // 2]) / 2
+
+
+def median_ci(samples, confidence=CONFIDENCE):
+    """
+    Confidence interval for the median from the order statistics of the
+    samples (exact, binomial). With few samples it is their full range.
+    """
+    xs = sorted(samples)
+    n = len(xs)
+    tail = (1 - confidence) / 2
+    k = 0
+    mass = math.comb(n, 0) / 2 ** n
+    while k < n // 2 and mass <= tail:
+        k += 1
+        mass += math.comb(n, k) / 2 ** n
+    k = max(k - 1, 0)
+    return xs[k], xs[n - 1 - k]
+
+
+def summary(samples):
+    low, high = median_ci(samples)
+    return {"median": median(samples), "ci": [low, high], "samples": samples}
+
+
+def mann_whitney(a, b):
+    """
+    Two-sided p-value of the Mann-Whitney U test that samples a and b come
+    from the same distribution (normal approximation with tie correction).
+    """
+    n1, n2 = len(a), len(b)
+    pooled = sorted([(x, 0) for x in a] + [(x, 1) for x in b])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    k = 0
+    while k < len(pooled):
+        end = k
+        while end + 1 < len(pooled) and pooled[end + 1][0] == pooled[k][0]:
+            end += 1
+        for m in range(k, end + 1):
+            ranks[m] = (k + end) / 2 + 1
+        t = end - k + 1
+        ties += t ** 3 - t
+        k = end + 1
+    u = sum(rank for rank, (_, group) in zip(ranks, pooled) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def suite_cases(suites, size=6, count=10, seed=0):
+    """
+    (suite, index, board, color) for every position of the named suites.
+    """
+    cases = []
+    for suite in suites:
+        if suite == "small":
+            cases += [(suite, k, board, 1) for k, board in enumerate(smallboards)]
+        elif suite == "big":
+            cases += [(suite, k, board, 1) for k, board in enumerate(bigboards)]
+        elif suite == "generated":
+            cases += [(suite, k, board, color) for k, (board, color) in enumerate(random_positions(size, count, seed))]
+        else:
+            raise ValueError("Unknown suite: {}".format(suite))
+    return cases
+
+
+def run_benchmark(filename, cases, settings):
+    """
+    Benchmark select_move_alphabeta of an agent file on the cases. Returns
+    the JSON-ready result dict.
+    """
+    module = load_agent_module(filename)
+    counter = getattr(module, "search_stats", None)
+    results = []
+    for suite, index, board, color in cases:
+        run = measure(module.select_move_alphabeta,
+                      (board, color, settings["limit"], settings["caching"], settings["ordering"]),
+                      settings["repeat"], settings["warmup"], counter)
+        results.append({"suite": suite, "index": index, "size": len(board), "color": color,
+                        "move": list(run["result"]),
+                        "nodes": median(run["nodes"]) if run["nodes"] else None,
+                        "wall": summary(run["wall"]), "cpu": summary(run["cpu"])})
+    return {"agent": filename, "settings": settings, "cases": results}
+
+
+def print_results(run):
+    print("{}  depth {} caching {} ordering {}  ({} runs)".format(
+        run["agent"], run["settings"]["limit"], run["settings"]["caching"], run["settings"]["ordering"],
+        run["settings"]["repeat"]))
+    print("{:<10} {:>4} {:>10} {:>21} {:>10} {:>10}".format("suite", "pos", "wall ms", "95% ci", "cpu ms", "nodes"))
+    for case in run["cases"]:
+        wall = case["wall"]
+        print("{:<10} {:>4} {:>10.2f} {:>10.2f}-{:<10.2f} {:>10.2f} {:>10}".format(
+            case["suite"], case["index"], 1000 * wall["median"], 1000 * wall["ci"][0], 1000 * wall["ci"][1],
+            1000 * case["cpu"]["median"], "-" if case["nodes"] is None else int(case["nodes"])))
+
+
+def compare(base, new, alpha=0.05):
+    """
+    Print base and new run side by side. Returns the number of cases where
+    new is significantly slower.
+    """
+    print("{:<10} {:>4} {:>10} {:>10} {:>7} {:>8}  {}".format("suite", "pos", "base ms", "new ms", "ratio", "p", ""))
+    baseline = dict(((case["suite"], case["index"]), case) for case in base["cases"])
+    regressions = 0
+    log_ratios = []
+    for case in new["cases"]:
+        old = baseline.get((case["suite"], case["index"]))
+        if old is None:
+            continue
+        ratio = case["wall"]["median"] / old["wall"]["median"] if old["wall"]["median"] > 0 else float("inf")
+        log_ratios.append(math.log(ratio) if 0 < ratio < float("inf") else 0.0)
+        p = mann_whitney(old["wall"]["samples"], case["wall"]["samples"])
+        notes = []
+        if p < alpha and ratio > 1:
+            notes.append("REGRESSION")
+            regressions += 1
+        elif p < alpha:
+            notes.append("faster")
+        if case["move"] != old["move"]:
+            notes.append("move {} -> {}".format(old["move"], case["move"]))
+        if case["nodes"] is not None and old["nodes"] is not None and case["nodes"] != old["nodes"]:
+            notes.append("nodes {:+.1%}".format(case["nodes"] / old["nodes"] - 1 if old["nodes"] else 0))
+        print("{:<10} {:>4} {:>10.2f} {:>10.2f} {:>7.3f} {:>8.4f}  {}".format(
+            case["suite"], case["index"], 1000 * old["wall"]["median"], 1000 * case["wall"]["median"],
+            ratio, p, " ".join(notes)))
+    if log_ratios:
+        print("geometric mean time ratio {:.3f}, {} significant regressions".format(
+            math.exp(sum(log_ratios) / len(log_ratios)), regressions))
+    return regressions
+
+
+def main(argv):
+
+    usage = 'othello_bench.py [-a <agent>] [-b <baseline agent> | -C <baseline.json>] [-s <suite,...>] [-l <depth-limit> -c -o] [-r <repeat> -w <warmup>] [-d <size> -n <count> -S <seed>] [-p <alpha>] [-f <results.json>]'
+    filename = "agent.py"
+    baseline_agent = None
+    baseline_file = None
+    suites = ["small", "big"]
+    size, count, seed = 6, 10, 0
+    alpha = 0.05
+    output = None
+    settings = {"limit": 4, "caching": 0, "ordering": 0, "repeat": 7, "warmup": 1}
+
+    try:
+        opts, args = getopt.getopt(argv, "ha:b:C:s:l:cor:w:d:n:S:p:f:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-a":
+            filename = arg
+        elif opt == "-b":
+            baseline_agent = arg
+        elif opt == "-C":
+            baseline_file = arg
+        elif opt == "-s":
+            suites = arg.split(",")
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-c":
+            settings["caching"] = 1
+        elif opt == "-o":
+            settings["ordering"] = 1
+        elif opt == "-r":
+            settings["repeat"] = int(arg)
+        elif opt == "-w":
+            settings["warmup"] = int(arg)
+        elif opt == "-d":
+            size = int(arg)
+        elif opt == "-n":
+            count = int(arg)
+        elif opt == "-S":
+            seed = int(arg)
+        elif opt == "-p":
+            alpha = float(arg)
+        elif opt == "-f":
+            output = arg
+
+    cases = suite_cases(suites, size, count, seed)
+    base = None
+    if baseline_file is not None:
+        with open(baseline_file) as f:
+            base = json.load(f)
+    elif baseline_agent is not None:
+        base = run_benchmark(baseline_agent, cases, settings)
+        print_results(base)
+        print()
+    run = run_benchmark(filename, cases, settings)
+    print_results(run)
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(run, f, indent=1)
+    if base is not None:
+        print()
+        if compare(base, run, alpha):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+"""
+This module contains a size-capped state cache for the AI players.
+
+BoundedCache supports the dict operations the min/max node functions use
+(in, [], []=, get, clear, len), so it can replace a plain caching_states
+dict. When the entry or byte budget is exceeded, the least recently used
+entries are evicted, but never the one just stored. Hit, miss and eviction counts are kept in cache.stats.
+"""
+
+import sys
+from collections import OrderedDict
+
+
+def estimate_size(key, value):
+    """
+    Rough number of bytes held by one cache entry. Boards are tuples of
+    row tuples; their small ints are shared and not counted.
+    """
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(key, tuple):
+        for row in key:
+            size += sys.getsizeof(row)
+    return size
+
+
+class BoundedCache(object):
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        max_entries and max_bytes are the two budgets; None disables one.
+        At least one budget should be given, otherwise the cache grows
+        without bound like a dict.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {} if max_bytes is not None else None
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __contains__(self, key):
+        if key in self.entries:
+            self.stats["hits"] += 1
+            return True
+        self.stats["misses"] += 1
+        return False
+
+    def __getitem__(self, key):
+        value = self.entries[key]
+        self.entries.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        entries = self.entries
+        if key in entries:
+            self.stats["hits"] += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.stats["misses"] += 1
+        return default
+
+    def __setitem__(self, key, value):
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            if self.sizes is not None:
+                self.nbytes -= self.sizes[key]
+        entries[key] = value
+        if self.sizes is not None:
+            size = estimate_size(key, value)
+            self.sizes[key] = size
+            self.nbytes += size
+            self.evict()
+        elif self.max_entries is not None and len(entries) > self.max_entries:
+            self.evict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def evict(self):
+        """
+        Evict least recently used entries until both budgets are met. The
+        newest entry is always kept, even if it alone exceeds max_bytes, so
+        a value just stored can be read back.
+        """
+        while len(self.entries) > 1 and ((self.max_entries is not None and len(self.entries) > self.max_entries) or
+                                         (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            key, _ = self.entries.popitem(last=False)
+            if self.sizes is not None:
+                self.nbytes -= self.sizes.pop(key)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Drop all entries. The counters are kept; use reset_stats for those.
+        """
+        self.entries.clear()
+        if self.sizes is not None:
+            self.sizes.clear()
+        self.nbytes = 0
+
+    def reset_stats(self):
+        for name in self.stats:
+            self.stats[name] = 0
@@ -0,0 +1,103 @@
+"""
+This module contains the time management used by the AI players when the
+depth limit is off. The game manager gives every move a fixed budget
+(othello_protocol.MOVE_TIMEOUT), so instead of one fixed depth the agents search
+with iterative deepening and let a TimeManager decide when to stop.
+
+The budget for a move depends on the number of empty squares (opening moves
+matter less, the endgame is solved quickly), the branching factor of the
+position and how stable the best move was between iterations. A hard
+deadline, a safety margin before the manager's timeout, is never passed.
+"""
+
+import time
+
+from othello_protocol import MOVE_TIMEOUT
+from othello_shared import get_possible_moves
+
+
+class TimeManager(object):
+
+    def __init__(self, move_timeout=MOVE_TIMEOUT, safety_margin=1.0):
+        self.move_timeout = move_timeout
+        self.safety_margin = safety_margin
+
+    def start(self, board, color):
+        """
+        Start the clock for a new move and compute its soft and hard limits.
+        """
+        self.start_time = time.perf_counter()
+        self.hard_limit = max(0.05, self.move_timeout - self.safety_margin)
+
+        squares = len(board) * len(board)
+        empties = sum(row.count(0) for row in board)
+        # Spend the least in the opening and the most in the middlegame;
+        # near the end the search completes long before the budget anyway.
+        filled = 1 - empties / squares
+        phase = 0.35 + 0.65 * min(1.0, 2 * filled)
+        # Positions with many choices need more time to reach the same depth.
+        branching = len(get_possible_moves(board, color))
+        complexity = min(1.5, 0.75 + branching / 16)
+
+        self.soft_limit = min(self.hard_limit, 0.5 * self.hard_limit * phase * complexity)
+        self.empties = empties
+        self.last_move = None
+        self.stable_iterations = 0
+        self.iteration_start = self.start_time
+        self.iteration_times = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def deadline(self):
+        """
+        perf_counter() value after which the search must be aborted.
+        """
+        return self.start_time + self.hard_limit
+
+    def iteration_done(self, depth, move):
+        """
+        Record a completed iteration and adjust the soft limit: a best move
+        that changed asks for more time, a stable one for less.
+        """
+        now = time.perf_counter()
+        self.iteration_times.append(now - self.iteration_start)
+        self.iteration_start = now
+        if move != self.last_move and self.last_move is not None:
+            self.stable_iterations = 0
+            self.soft_limit = min(self.hard_limit, self.soft_limit * 1.5)
+        else:
+            self.stable_iterations += 1
+            if self.stable_iterations >= 4:
+                self.soft_limit *= 0.85
+        self.last_move = move
+
+    def next_iteration(self, depth):
+        """
+        True if an iteration to the given depth is worth starting, i.e. it
+        is not deeper than the game and its predicted finishing time is
+        within the soft limit.
+        """
+        if depth > self.empties:
+            return False
+        times = self.iteration_times
+        if len(times) >= 2 and times[-2] > 0:
+            growth = min(8.0, max(2.0, times[-1] / times[-2]))
+        else:
+            growth = 4.0
+        predicted = times[-1] * growth if times else 0.0
+        return self.elapsed() + predicted < self.soft_limit
+
+
+class FixedTimeManager(TimeManager):
+    """
+    Spends all of move_timeout on every move, as for analysis at a fixed
+    time per position: iterations are started as long as time is left, and
+    the one still running when it is used up is abandoned.
+    """
+
+    def __init__(self, move_timeout):
+        TimeManager.__init__(self, move_timeout, safety_margin=0)
+
+    def next_iteration(self, depth):
+        return depth <= self.empties and self.elapsed() < self.hard_limit
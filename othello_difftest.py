@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module runs the search of two agent implementations, or of one agent
+in two configurations, on the same random reachable positions and reports
+every position where they choose a different move or find a different
+value, with the node and time ratios between them.
+
+An implementation is an agent file, optionally followed by ":" and the
+options to search with: c for caching, o for node ordering. For example
+
+    python3 othello_difftest.py -x agent.py -y agent.py:c -l 1,2,3,4 -n 1000
+    python3 othello_difftest.py -x agent.py:o -y agent.py:co -d 4,6 -l 5
+    python3 othello_difftest.py -x agent2.py -y agent_competition.py -l 2 -m
+
+compares alpha-beta (minimax with -m) from the max node at every depth.
+A different move with the same value is a tie; ties are disagreements too,
+since an optimisation such as caching must not change the chosen move, but
+-t accepts them when comparing implementations that may break ties between
+equal moves differently. Disagreements are printed with the position in
+othello_batch's format, and all of them can be written as JSON lines (-f).
+The exit status is 1 if there are any.
+"""
+import sys, getopt
+import json
+import os
+import time
+import multiprocessing
+
+from othello_game import load_agent_module
+from othello_positions import random_positions
+from othello_protocol import encode_board
+
+implementations = None
+
+
+def parse_spec(spec):
+    """
+    (file, caching, ordering) from "agent.py" or "agent.py:co".
+    """
+    filename, _, options = spec.partition(":")
+    return filename, int("c" in options), int("o" in options)
+
+
+def init_worker(specs):
+    global implementations
+    implementations = [(load_agent_module(filename), caching, ordering)
+                       for filename, caching, ordering in map(parse_spec, specs)]
+
+
+def search(implementation, board, color, depth, minimax):
+    """
+    Run one implementation from scratch. Returns (move, value, nodes or
+    None, seconds).
+    """
+    module, caching, ordering = implementation
+    if hasattr(module, "clear_caches"):
+        module.clear_caches()
+    else:
+        module.caching_states.clear()
+    counter = getattr(module, "search_stats", None)
+    if counter is not None:
+        counter["nodes"] = 0
+    start = time.perf_counter()
+    if minimax:
+        move, value = module.minimax_max_node(board, color, depth, caching)
+    else:
+        move, value = module.alphabeta_max_node(board, color, float("-inf"), float("inf"), depth, caching, ordering)
+    seconds = time.perf_counter() - start
+    return move, value, counter["nodes"] if counter is not None else None, seconds
+
+
+def compare_position(task):
+    number, board, color, depth, minimax = task
+    (move_x, value_x, nodes_x, time_x), (move_y, value_y, nodes_y, time_y) = [
+        search(implementation, board, color, depth, minimax) for implementation in implementations]
+    return {"search": number, "size": len(board), "board": encode_board(board, 2), "color": color, "depth": depth,
+            "move": [list(move_x), list(move_y)], "value": [value_x, value_y],
+            "nodes": [nodes_x, nodes_y], "time": [time_x, time_y]}
+
+
+def verdict(result):
+    """
+    "value", "tie" (same value, different move) or "" (agreement).
+    """
+    if result["value"][0] != result["value"][1]:
+        return "value"
+    if result["move"][0] != result["move"][1]:
+        return "tie"
+    return ""
+
+
+def ratio(x, y):
+    return y / x if x else float("nan")
+
+
+def main(argv):
+
+    usage = 'othello_difftest.py -x <agent[:co]> -y <agent[:co]> [-d <size,...>] [-l <depth,...>] [-n <positions per size>] [-S <seed>] [-m] [-t] [-j <workers>] [-e <examples>] [-f <disagreements.jsonl>]'
+    specs = [None, None]
+    sizes = [6]
+    depths = [1, 2, 3]
+    count = 200
+    seed = 0
+    minimax = False
+    strict = True
+    workers = os.cpu_count() or 1
+    examples = 10
+    output = None
+
+    try:
+        opts, args = getopt.getopt(argv, "hx:y:d:l:n:S:mtj:e:f:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-x":
+            specs[0] = arg
+        elif opt == "-y":
+            specs[1] = arg
+        elif opt == "-d":
+            sizes = [int(x) for x in arg.split(",")]
+        elif opt == "-l":
+            depths = [int(x) for x in arg.split(",")]
+        elif opt == "-n":
+            count = int(arg)
+        elif opt == "-S":
+            seed = int(arg)
+        elif opt == "-m":
+            minimax = True
+        elif opt == "-t":
+            strict = False
+        elif opt == "-j":
+            workers = int(arg)
+        elif opt == "-e":
+            examples = int(arg)
+        elif opt == "-f":
+            output = arg
+
+    if None in specs:
+        print(usage)
+        sys.exit(2)
+
+    tasks = []
+    for size in sizes:
+        for board, color in random_positions(size, count, seed):
+            for depth in depths:
+                tasks.append((len(tasks), board, color, depth, minimax))
+
+    totals = {}
+    shown = 0
+    out = open(output, "w") if output else None
+    print("x = {}, y = {}, {} {} searches".format(specs[0], specs[1], len(tasks), "minimax" if minimax else "alpha-beta"))
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(specs,)) as pool:
+        for result in pool.imap_unordered(compare_position, tasks, chunksize=8):
+            key = (result["size"], result["depth"])
+            entry = totals.setdefault(key, {"positions": 0, "value": 0, "tie": 0,
+                                            "nodes": [0, 0], "counted": True, "time": [0.0, 0.0]})
+            entry["positions"] += 1
+            kind = verdict(result)
+            if kind == "tie" and not strict:
+                kind = ""
+            if kind:
+                entry[kind] += 1
+                if out is not None:
+                    out.write(json.dumps(dict(result, kind=kind)) + "\n")
+                if shown < examples:
+                    shown += 1
+                    print("  {:<5} {} {} depth {}: x {} {}, y {} {}".format(
+                        kind, result["board"], result["color"], result["depth"], result["move"][0], result["value"][0],
+                        result["move"][1], result["value"][1]))
+            for k in (0, 1):
+                entry["time"][k] += result["time"][k]
+                if result["nodes"][k] is None:
+                    entry["counted"] = False
+                else:
+                    entry["nodes"][k] += result["nodes"][k]
+    if out is not None:
+        out.close()
+
+    print("{:>4} {:>5} {:>9} {:>7} {:>7} {:>11} {:>10}".format(
+        "size", "depth", "positions", "value", "tie", "nodes y/x", "time y/x"))
+    disagreements = 0
+    for (size, depth), entry in sorted(totals.items()):
+        disagreements += entry["value"] + entry["tie"]
+        print("{:>4} {:>5} {:>9} {:>7} {:>7} {:>11} {:>10.3f}".format(
+            size, depth, entry["positions"], entry["value"], entry["tie"],
+            "{:.3f}".format(ratio(*entry["nodes"])) if entry["counted"] and entry["nodes"][0] else "-", ratio(*entry["time"])))
+    if disagreements:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
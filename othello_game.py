@@ -7,9 +7,16 @@ players.
 Thanks to original author Daniel Bauer, Columbia University
 """
 import sys
+import os
+import time
+import itertools
+import importlib.util
+import selectors
 import subprocess
-from threading import Timer
+from collections import namedtuple
+from concurrent import futures
 from othello_shared import find_lines, get_possible_moves, play_move, get_score
+from othello_protocol import parse_introduction, negotiate, encode_board, encode_delta, parse_info, encode_info, CHECK_INTERVAL, MOVE_TIMEOUT
 
 class InvalidMoveError(RuntimeError):
     pass
@@ -29,10 +36,38 @@ class Player(object):
 
 class AiPlayerInterface(Player):
 
-    TIMEOUT = 10 
+    TIMEOUT = MOVE_TIMEOUT
+    SOFT_TIMEOUT = 8 # a move slower than this is reported before the hard kill at TIMEOUT
+    STDERR = None # where the AI processes' stderr goes, None for the manager's stderr
+    FINAL_GRACE = 2 # seconds an AI may take to shut down (e.g. to write profiles) after FINAL
+    on_info = None # called with each parse_info dict of search progress the AI sends (protocol 5)
 
-    def __init__(self, filename, color, limit, minimax = False, caching = False, ordering = False):
-        
+    def __init__(self, filename, color, limit, minimax = False, caching = False, ordering = False, on_info = None):
+        """
+        on_info must be given here for the AI to be asked for search
+        progress; it may be replaced later.
+        """
+        if on_info is not None:
+            self.on_info = on_info
+        self.start(filename)
+        self.configure(color, limit, minimax, caching, ordering)
+
+    def start(self, filename):
+        self.process = subprocess.Popen(['python3',filename], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=AiPlayerInterface.STDERR)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.process.stdout, selectors.EVENT_READ)
+        self.buffer = b""
+        self.latencies = [] # seconds from sending each position to receiving the move
+        name, version = parse_introduction(self.read_line())
+        print("AI introduced itself as: {}".format(name))
+        self.name = name
+        self.protocol = negotiate(version, self.on_info is not None)
+
+    def configure(self, color, limit, minimax = False, caching = False, ordering = False, reset = False):
+        """
+        Send the settings for a game. With reset, a protocol 4 AI that has
+        finished a game is started on a new one.
+        """
         #convert params to numbers 
         m = 0 
         if minimax == True: m = 1
@@ -42,44 +77,186 @@ class AiPlayerInterface(Player):
         if ordering == True: o = 1
 
         self.color = color
-        self.process = subprocess.Popen(['python3',filename], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-        name = self.process.stdout.readline().decode("ASCII").strip()
-        print("AI introduced itself as: {}".format(name))
-        self.name = name
-        self.process.stdin.write((str(color) + "," + str(limit) + "," + str(m) + "," + str(c) + "," + str(o) + "\n").encode("ASCII"))
+        setup = [color, limit, m, c, o]
+        if self.protocol >= 2:
+            setup.append(self.protocol)
+        self.send(("RESET " if reset else "") + ",".join([str(x) for x in setup]))
+        self.seen_moves = None # with protocol 3, number of the game's moves the AI knows about
+        self.turns = 0
+        self.timed_out = False
+
+    def send(self, line):
+        self.process.stdin.write((line + "\n").encode("ASCII"))
         self.process.stdin.flush()
 
+    def send_position(self, manager):
+        if self.protocol < 3:
+            white_score, dark_score = get_score(manager.board)
+            self.send("SCORE {} {}".format(white_score, dark_score))
+            self.send(encode_board(manager.board, self.protocol))
+        elif self.seen_moves is None:
+            self.send("BOARD " + encode_board(manager.board, 2))
+        else:
+            self.turns += 1
+            check = manager.board if self.turns % CHECK_INTERVAL == 0 else None
+            self.send(encode_delta([(i, j) for _, i, j in manager.moves[self.seen_moves:]], check))
+
+    def read_line(self, deadline = None, warn_at = None):
+        """
+        Read one line from the AI without blocking past deadline (a
+        time.perf_counter() value, None to wait forever). Reports a slow AI
+        once warn_at has passed. Returns None if the deadline passed, and an
+        empty string if the AI closed its output.
+        """
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            wait = None
+            if deadline is not None:
+                now = time.perf_counter()
+                if now >= deadline:
+                    return None
+                if warn_at is not None and now >= warn_at:
+                    sys.stderr.write("{} is slow: no move after {:.1f}s.\n".format(self.name, now - warn_at + AiPlayerInterface.SOFT_TIMEOUT))
+                    warn_at = None
+                wait = (deadline if warn_at is None else min(deadline, warn_at)) - now
+            if self.selector.select(wait):
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    line, self.buffer = self.buffer, b""
+                    return line.decode("ASCII")
+                self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line.decode("ASCII")
+
     def timeout(self): 
-        sys.stderr.write("{} timed out.".format(self.name))
+        sys.stderr.write("{} timed out.\n".format(self.name))
         self.process.kill() 
         self.timed_out = True
 
     def get_move(self, manager):
         white_score, dark_score = get_score(manager.board)
         print((white_score, dark_score))
-        self.process.stdin.write("SCORE {} {}\n".format(white_score, dark_score).encode("ASCII"))
-        self.process.stdin.flush()
-        self.process.stdin.write("{}\n".format(str(manager.board)).encode("ASCII"))
-        self.process.stdin.flush()
-
-        timer = Timer(AiPlayerInterface.TIMEOUT, lambda: self.timeout())
-        self.timed_out = False
-        timer.start()
+        self.send_position(manager)
+        start = time.perf_counter()
+        deadline = start + AiPlayerInterface.TIMEOUT
+        warn_at = start + AiPlayerInterface.SOFT_TIMEOUT
 
         # Wait for the AI call
-        move_s = self.process.stdout.readline().decode("ASCII")
-        if self.timed_out:  
+        move_s = self.read_line(deadline, warn_at)
+        if move_s is not None and move_s.strip() == "RESYNC": # the AI's own board is out of date
+            self.send("BOARD " + encode_board(manager.board, 2))
+            move_s = self.read_line(deadline, warn_at)
+        while move_s is not None and move_s.startswith("INFO "):
+            if self.on_info is not None:
+                self.on_info(parse_info(move_s))
+            move_s = self.read_line(deadline, warn_at)
+        if move_s is None:
+            self.timeout()
             raise AiTimeoutError
-        timer.cancel()
+        self.latencies.append(time.perf_counter() - start)
         i_s, j_s = move_s.strip().split()
         i = int(i_s)
         j = int(j_s)
+        self.seen_moves = len(manager.moves) + 1 # the AI has played this move on its own board
         return i,j 
     
-    def kill(self,manager):
+    def finish(self, manager):
+        """
+        Tell the AI the game is over. Returns False if it cannot be told.
+        """
         white_score, dark_score = get_score(manager.board)
-        self.process.stdin.write("FINAL {} {}\n".format(white_score, dark_score).encode("ASCII"))
+        try:
+            self.send("FINAL {} {}".format(white_score, dark_score))
+        except OSError:
+            return False
+        return True
+
+    def kill(self,manager):
+        # Only a protocol 4 AI ends cleanly at the end of its input; an older
+        # one would wait for its next board and fail on the closed stdin.
+        if self.finish(manager) and self.protocol >= 4:
+            try:
+                self.process.stdin.close() # end of input, so a protocol 4 AI stops waiting for RESET
+                self.process.wait(AiPlayerInterface.FINAL_GRACE)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
         self.process.kill() 
+        self.selector.close()
+
+
+agent_module_ids = itertools.count()
+
+def load_agent_module(filename):
+    """
+    Import an AI's file as a new module object, so that every player loaded
+    from the same file has its own module-level state (e.g. caches).
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    if directory not in sys.path:
+        sys.path.append(directory)
+    name = "othello_agent_{}".format(next(agent_module_ids))
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class InProcessAiPlayer(AiPlayerInterface):
+    """
+    Plays an AI by importing its file and calling its select_move_* function
+    directly instead of talking to a separate python3 process. The move is
+    computed on a worker thread so the timeout can be enforced; a search
+    that times out cannot be killed, only asked to stop (agents that have a
+    search_deadline stop at the next node).
+    """
+
+    def __init__(self, filename, color, limit, minimax = False, caching = False, ordering = False, on_info = None):
+        if on_info is not None:
+            self.on_info = on_info
+        self.module = load_agent_module(filename)
+        if hasattr(self.module, "setup_from_env"):  # the same startup options as run_ai
+            self.module.setup_from_env()
+        self.name = os.path.splitext(os.path.basename(filename))[0]
+        print("AI loaded in process: {}".format(self.name))
+        self.color = color
+        self.limit = limit
+        self.minimax = 1 if minimax else 0
+        self.caching = 1 if caching else 0
+        self.ordering = 1 if ordering else 0
+        self.executor = futures.ThreadPoolExecutor(max_workers=1)
+
+    def select_move(self, board):
+        module = self.module
+        if hasattr(module, "search_deadline"):
+            module.search_deadline = None  # a search that timed out before this one was stopped with 0
+        if self.minimax and hasattr(module, "select_move_minimax"):
+            return module.select_move_minimax(board, self.color, self.limit, self.caching)
+        if self.limit == -1 and hasattr(module, "select_move_timed"):
+            return module.select_move_timed(board, self.color, self.caching, self.ordering)
+        if hasattr(module, "select_move_alphabeta"):
+            return module.select_move_alphabeta(board, self.color, self.limit, self.caching, self.ordering)
+        return module.select_move(board, self.color)
+
+    def report_info(self, depth, nodes, seconds, value, pv):
+        if self.on_info is not None:
+            self.on_info(parse_info(encode_info(depth, nodes, seconds, value, pv)))
+
+    def get_move(self, manager):
+        board = tuple(tuple(row) for row in manager.board)
+        if hasattr(self.module, "info_callback"):  # building the PV costs time, only when someone listens
+            self.module.info_callback = self.report_info if self.on_info is not None else None
+        future = self.executor.submit(self.select_move, board)
+        try:
+            i, j = future.result(AiPlayerInterface.TIMEOUT)
+        except futures.TimeoutError:
+            sys.stderr.write("{} timed out.\n".format(self.name))
+            if hasattr(self.module, "search_deadline"):
+                self.module.search_deadline = 0
+            raise AiTimeoutError
+        return i, j
+
+    def kill(self, manager):
+        self.executor.shutdown(wait=False)
 
 
 class OthelloGameManager(object):
@@ -89,6 +266,7 @@ class OthelloGameManager(object):
         self.dimension = dimension
         self.board = self.create_initial_board()
         self.current_player = 1
+        self.moves = [] # (player, i, j) of every move played
             
     def create_initial_board(self):
         board = []
@@ -121,35 +299,54 @@ class OthelloGameManager(object):
            raise InvalidMoveError("Invalid Move.")
      
         self.board = play_move(self.board, self.current_player, i, j) 
+        self.moves.append((self.current_player, i, j))
         self.current_player = 1 if self.current_player == 2 else 2
 
     def get_possible_moves(self):
         return get_possible_moves(self.board, self.current_player)
 
-def play_game(game, player1, player2):
+# Outcome of play_game: final scores, the color that timed out (or None), seconds each
+# color spent in get_move (index 1 dark, 2 light) and the (player, i, j) moves played.
+GameResult = namedtuple("GameResult", ["dark_score", "light_score", "timed_out", "think_time", "moves"])
 
+def play_game(game, player1, player2, verbose = True, record = None):
+    """
+    Play a game to the end. If record is an othello_record.RecordWriter, the
+    game is appended to it move by move.
+    """
     players = [None, player1, player2]
+    think_time = [None, 0.0, 0.0]
+    timed_out = None
+    if record is not None:
+        record.begin_game(game.dimension, player1.name, player2.name, game.board, game.current_player)
 
-    while True: 
-        player_obj = players[game.current_player]
-        possible_moves = game.get_possible_moves() 
-        if not possible_moves: 
-            p1score, p2score = get_score(game.board)
-            print("FINAL: {} (dark) {}:{} {} (light)".format(player1.name, p1score, p2score, player2.name))
-            player1.kill(game)
-            player2.kill(game)
-            break 
-        else: 
-            color = "dark" if game.current_player == 1 else "light"
-            try: 
-                i, j = player_obj.get_move(game)
-                print("{} ({}) plays {},{}".format(player_obj.name, color, i,j))
-                game.play(i,j)
-            except AiTimeoutError:
-                print("{} ({}) timed out!".format(player_obj.name, color))
-                print("FINAL: {} (dark) {}:{} {} (light)".format(player_obj.name, p1score, p2score, player2.name))
+    try:
+        while True: 
+            player_obj = players[game.current_player]
+            possible_moves = game.get_possible_moves() 
+            if not possible_moves: 
+                p1score, p2score = get_score(game.board)
+                if verbose: print("FINAL: {} (dark) {}:{} {} (light)".format(player1.name, p1score, p2score, player2.name))
                 player1.kill(game)
                 player2.kill(game)
-                break
-
-
+                break 
+            else: 
+                color = "dark" if game.current_player == 1 else "light"
+                try: 
+                    start = time.perf_counter()
+                    i, j = player_obj.get_move(game)
+                    think_time[game.current_player] += time.perf_counter() - start
+                    if verbose: print("{} ({}) plays {},{}".format(player_obj.name, color, i,j))
+                    game.play(i,j)
+                    if record is not None: record.move((i, j))
+                except AiTimeoutError:
+                    timed_out = game.current_player
+                    if verbose: print("{} ({}) timed out!".format(player_obj.name, color))
+                    p1score, p2score = get_score(game.board)
+                    if verbose: print("FINAL: {} (dark) {}:{} {} (light)".format(player1.name, p1score, p2score, player2.name))
+                    player1.kill(game)
+                    player2.kill(game)
+                    break
+    finally:
+        if record is not None: record.end_game() # also for a game an exception cut short, so the next game reads back
+    return GameResult(p1score, p2score, timed_out, think_time, list(game.moves))
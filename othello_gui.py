@@ -6,16 +6,25 @@ This module contains a simple graphical user interface for Othello.
 Thanks to original author Daniel Bauer, Columbia University
 """
 import sys, getopt
+import queue
+import threading
 
 from tkinter import *
 from tkinter import scrolledtext
 
-from othello_game import OthelloGameManager, AiPlayerInterface, Player, InvalidMoveError, AiTimeoutError
+from othello_game import OthelloGameManager, AiPlayerInterface, InProcessAiPlayer, Player, InvalidMoveError, AiTimeoutError
 from othello_shared import get_possible_moves, get_score
+from othello_analysis import AnalysisEngine
+
+AI_POLL_MS = 50 # how often the GUI checks on a thinking AI
 
 class OthelloGui(object):
 
-    def __init__(self, game_manager, player1, player2):
+    def __init__(self, game_manager, player1, player2, analysis = None):
+        """
+        analysis is an agent file to score the moves of the shown position
+        with, or None for no analysis.
+        """
 
         self.game = game_manager
         self.players = [None, player1, player2]
@@ -33,11 +42,28 @@ class OthelloGui(object):
         self.canvas = Canvas(root,height = self.cell_size * self.height + self.offset,width = self.cell_size * self.width + self.offset)
         self.move_label = Label(root)
         self.score_label = Label(root)
+        self.info_label = Label(root) # search progress of the AI that is thinking
         self.text = scrolledtext.ScrolledText(root, width=70, height=10)
         self.move_label.pack(side="top")
         self.score_label.pack(side="top")
+        self.info_label.pack(side="top")
         self.canvas.pack()
         self.text.pack()
+        # Canvas items are created once and then reconfigured, see draw_disks
+        self.disks = None
+        self.shown = None # the board the disk items currently show
+        self.score_items = None # per square text items for analysis scores
+        self.draw_grid()
+        # Positions of the game so far; view is the index of the one shown, None for the current one
+        self.history = []
+        self.view = None
+        self.root.bind("<Left>", lambda e: self.step(-1))
+        self.root.bind("<Right>", lambda e: self.step(1))
+        self.analysis = None
+        if analysis is not None:
+            self.analysis_results = queue.Queue()
+            self.analysis = AnalysisEngine(analysis, lambda *result: self.analysis_results.put(result))
+            self.root.after(AI_POLL_MS, lambda: self.poll_analysis())
         self.draw_board()
 
     def get_position(self,x,y):
@@ -46,6 +72,9 @@ class OthelloGui(object):
         return i,j
 
     def mouse_pressed(self,event):
+        if self.view is not None:
+            self.log("Go back to the current position (Right arrow) to play.")
+            return
         i,j = self.get_position(event.x, event.y)
 
         try:
@@ -70,60 +99,170 @@ class OthelloGui(object):
             self.players[2].kill(self.game)
  
     def ai_move(self):
+        """
+        Let the AI to move think on a background thread, so the window stays
+        responsive. The thread reports progress and the move through a
+        queue that poll_ai reads on the Tk thread.
+        """
         player_obj = self.players[self.game.current_player]
+        messages = queue.Queue()
+        player_obj.on_info = lambda info: messages.put(("info", info))
+        threading.Thread(target=self.think, args=(player_obj, messages), daemon=True).start()
+        self.root.after(AI_POLL_MS, lambda: self.poll_ai(player_obj, messages))
+
+    def think(self, player_obj, messages):
         try:
-            i,j = player_obj.get_move(self.game)
-            player = "Dark" if self.game.current_player == 1 else "Light"
-            player = "{} {}".format(player_obj.name, player)
-            self.log("{}: {},{}".format(player, i,j))
-            self.game.play(i,j)
-            self.draw_board()
-            if not get_possible_moves(self.game.board, self.game.current_player):
-                self.shutdown("Game Over")
-            elif isinstance(self.players[self.game.current_player], AiPlayerInterface):
-                self.root.after(1, lambda: self.ai_move())
-            else: 
-                self.root.bind("<Button-1>",lambda e: self.mouse_pressed(e))        
+            messages.put(("move", player_obj.get_move(self.game)))
         except AiTimeoutError:
-            self.shutdown("Game Over, {} lost (timeout)".format(player_obj.name))
+            messages.put(("timeout", None))
+        except Exception as e:
+            messages.put(("error", e))
+
+    def poll_ai(self, player_obj, messages):
+        while True:
+            try:
+                kind, value = messages.get_nowait()
+            except queue.Empty:
+                self.root.after(AI_POLL_MS, lambda: self.poll_ai(player_obj, messages))
+                return
+            if kind == "info":
+                self.show_info(player_obj, value)
+            elif kind == "move":
+                self.ai_moved(player_obj, *value)
+                return
+            elif kind == "timeout":
+                self.shutdown("Game Over, {} lost (timeout)".format(player_obj.name))
+                return
+            else:
+                raise value
+
+    def show_info(self, player_obj, info):
+        self.info_label["text"] = "{}: depth {}  nodes {}  {} nodes/s  score {:g}  pv {}".format(
+            player_obj.name, info["depth"], info["nodes"], info["nps"], info["score"],
+            " ".join("{},{}".format(i, j) for i, j in info["pv"]))
+
+    def ai_moved(self, player_obj, i, j):
+        player = "Dark" if self.game.current_player == 1 else "Light"
+        player = "{} {}".format(player_obj.name, player)
+        self.log("{}: {},{}".format(player, i,j))
+        self.game.play(i,j)
+        self.draw_board()
+        if not get_possible_moves(self.game.board, self.game.current_player):
+            self.shutdown("Game Over")
+        elif isinstance(self.players[self.game.current_player], AiPlayerInterface):
+            self.root.after(1, lambda: self.ai_move())
+        else: 
+            self.root.bind("<Button-1>",lambda e: self.mouse_pressed(e))        
 
     def run(self):
         if isinstance(self.players[1], AiPlayerInterface):
             self.root.after(10, lambda: self.ai_move())
         else: 
             self.root.bind("<Button-1>",lambda e: self.mouse_pressed(e))        
-        self.draw_board()
         self.canvas.mainloop()
 
+    def shown_position(self):
+        if self.view is None:
+            return self.game.board, self.game.current_player
+        return self.history[self.view]
+
+    def step(self, offset):
+        """
+        Show an earlier or later position of the game.
+        """
+        index = len(self.history) - 1 if self.view is None else self.view
+        index = max(0, min(len(self.history) - 1, index + offset))
+        self.view = None if index == len(self.history) - 1 else index
+        self.draw_board()
+
     def draw_board(self):
-        self.draw_grid()
-        self.draw_disks()
-        player = "Dark" if self.game.current_player == 1 else "Light"
+        if len(self.history) <= len(self.game.moves):
+            self.history.append((tuple(tuple(row) for row in self.game.board), self.game.current_player))
+        board, current_player = self.shown_position()
+        self.draw_disks(board)
+        player = "Dark" if current_player == 1 else "Light"
+        if self.view is not None:
+            player = "{} (move {} of {})".format(player, self.view, len(self.history) - 1)
         self.move_label["text"]= player
-        self.score_label["text"]= "Dark {} : {} Light".format(*get_score(self.game.board)) 
+        self.score_label["text"]= "Dark {} : {} Light".format(*get_score(board)) 
+        if self.analysis is not None:
+            self.show_scores({})
+            self.analysis.analyse(board, current_player)
+
+    def poll_analysis(self):
+        while True:
+            try:
+                board, color, depth, scores = self.analysis_results.get_nowait()
+            except queue.Empty:
+                break
+            shown_board, shown_color = self.shown_position()
+            if color == shown_color and board == tuple(tuple(row) for row in shown_board):
+                self.show_scores(scores)
+                self.info_label["text"] = "Analysis depth {}".format(depth)
+        self.root.after(AI_POLL_MS, lambda: self.poll_analysis())
+
+    def show_scores(self, scores):
+        """
+        Show the analysis score of each move (i,j) on its square, the best in yellow.
+        """
+        best = max(scores.values()) if scores else None
+        for i in range(self.width):
+            for j in range(self.height):
+                item = self.score_items[j][i]
+                if (i, j) in scores:
+                    self.canvas.itemconfigure(item, text="{:+g}".format(scores[(i, j)]), state="normal",
+                                              fill="yellow" if scores[(i, j)] == best else "light gray")
+                else:
+                    self.canvas.itemconfigure(item, state="hidden")
    
     def log(self, msg, newline = True): 
         self.text.insert("end","{}{}".format(msg, "\n" if newline else ""))
         self.text.see("end")
  
     def draw_grid(self):
+        """
+        Create the squares and one hidden disk item per square. Called once.
+        """
         for i in range(self.height):
             for j in range(self.width):
                 self.canvas.create_rectangle(i*self.cell_size + self.offset, j*self.cell_size + self.offset, (i+1)*self.cell_size + self.offset, (j+1)*self.cell_size + self.offset, fill="dark green")
-       
-    def draw_disk(self, i,j, color):
+        self.disks = [[self.create_disk(j, i) for j in range(self.width)] for i in range(self.height)]
+        self.score_items = [[self.canvas.create_text((j + 0.5) * self.cell_size + self.offset, (i + 0.5) * self.cell_size + self.offset, state="hidden")
+                             for j in range(self.width)] for i in range(self.height)]
+        self.shown = [[0] * self.width for _ in range(self.height)]
+
+    def create_disk(self, i,j):
         x = i * self.cell_size + self.offset
         y = j * self.cell_size + self.offset
         padding =2 
-        self.canvas.create_oval(x+padding, y+padding, x+self.cell_size-padding, y+self.cell_size-padding, fill=color)
+        return self.canvas.create_oval(x+padding, y+padding, x+self.cell_size-padding, y+self.cell_size-padding, state="hidden")
+
+    def draw_disk(self, i,j, color):
+        if color is None:
+            self.canvas.itemconfigure(self.disks[j][i], state="hidden")
+        else:
+            self.canvas.itemconfigure(self.disks[j][i], fill=color, state="normal")
         
-    def draw_disks(self):
+    def draw_disks(self, board):
+        """
+        Reconfigure the disk items of the squares that changed since the
+        last call.
+        """
+        colors = [None, "black", "white"]
         for i in range(self.height): 
+            row = board[i]
+            shown = self.shown[i]
             for j  in range(self.width): 
-                if self.game.board[i][j] == 1:
-                    self.draw_disk(j, i, "black")
-                elif self.game.board[i][j] == 2:
-                    self.draw_disk(j, i, "white")
+                if row[j] != shown[j]:
+                    self.draw_disk(j, i, colors[row[j]])
+                    shown[j] = row[j]
+
+def ignore_info(info):
+    """
+    on_info of the AI players until ai_move sets their own, so that they
+    are asked for search progress.
+    """
+    pass
 
 def main(argv):
 
@@ -132,17 +271,19 @@ def main(argv):
     ordering = False
     caching = False
     minimax = False        
+    player_class = AiPlayerInterface
     agent1 = None
     agent2 = None
+    analysis = None
 
     try:
-        opts, args = getopt.getopt(argv,"hcmol:d:a:b:",["limit=","dimension=","agent1=","agent2="])
+        opts, args = getopt.getopt(argv,"hcmoil:d:a:b:A:",["limit=","dimension=","agent1=","agent2=","inprocess","analysis="])
     except getopt.GetoptError:
-        print('othello_gui.py -d <dimension> [-a <agentA> -b <agentB> -l <depth-limit> -c -o -m]')
+        print('othello_gui.py -d <dimension> [-a <agentA> -b <agentB> -l <depth-limit> -c -o -m -i] [-A <analysis agent>]')
         sys.exit(2)
     for opt, arg in opts:
         if opt == '-h':
-            print('othello_gui.py -d <dimension> -a <agentA> [-b <agentB> -l <depth-limit> -c -o]')
+            print('othello_gui.py -d <dimension> -a <agentA> [-b <agentB> -l <depth-limit> -c -o -i] [-A <analysis agent>]')
             sys.exit()
         elif opt in ("-d", "--dimension"):
             size = int(arg)
@@ -158,24 +299,28 @@ def main(argv):
             ordering = True   
         elif opt in ("-l", "--limit"):
             limit = int(arg)  
+        elif opt in ("-i", "--inprocess"):
+            player_class = InProcessAiPlayer # import the agents instead of running them as processes
+        elif opt in ("-A", "--analysis"):
+            analysis = arg # score the moves of the shown position with this agent, arrow keys step through the game
 
     if size <= 0: #if no dimension provided
         print('Please provide a board size.')
-        print('othello_gui.py -d <dimension> [-a <agentA> -b <agentB> -l <depth-limit> -c -o]')
+        print('othello_gui.py -d <dimension> [-a <agentA> -b <agentB> -l <depth-limit> -c -o -i]')
         sys.exit(2)  
 
     if agent1 != None and agent2 != None and size > 0:
-        p1 = AiPlayerInterface(agent1,1,limit,minimax,caching,ordering)
-        p2 = AiPlayerInterface(agent2,2,limit,minimax,caching,ordering)        
+        p1 = player_class(agent1,1,limit,minimax,caching,ordering,on_info=ignore_info)
+        p2 = player_class(agent2,2,limit,minimax,caching,ordering,on_info=ignore_info)
     elif agent1 != None and size > 0:
         p1 = Player(1)
-        p2 = AiPlayerInterface(agent1,2,limit,minimax,caching,ordering)
+        p2 = player_class(agent1,2,limit,minimax,caching,ordering,on_info=ignore_info)
     else: 
         p1 = Player(1)
         p2 = Player(2)
         
     game = OthelloGameManager(size)
-    gui = OthelloGui(game, p1, p2) 
+    gui = OthelloGui(game, p1, p2, analysis) 
     gui.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+"""
+This module contains the parts of the agents' weighted heuristic that do not
+depend on the agent: the extra features othello_tune.py fits weights for and
+the loading of tuned weights.
+
+An agent keeps its own heuristic_features (name -> function(board, color))
+and heuristic_weights (name -> weight), evaluates with weighted_sum and, at
+startup, replaces the weights with the file OTHELLO_WEIGHTS names:
+
+    load_weights(os.environ[WEIGHTS_ENV], heuristic_weights, heuristic_features)
+"""
+
+import json
+
+WEIGHTS_ENV = "OTHELLO_WEIGHTS"
+DEFAULT_WEIGHTS = {"utility": 0.2, "choice": 0.2, "corner": 0.7}
+
+
+# Discs on the squares diagonally next to an empty corner, which give the corner away
+def compute_xsquare(board, color):
+    opponent = 1 if color == 2 else 2
+    n = len(board)
+    value = 0
+    for (i, j), (xi, xj) in (((0, 0), (1, 1)), ((0, n - 1), (1, n - 2)), ((n - 1, 0), (n - 2, 1)), ((n - 1, n - 1), (n - 2, n - 2))):
+        if board[i][j] == 0:
+            if board[xi][xj] == color:
+                value += 1
+            elif board[xi][xj] == opponent:
+                value -= 1
+    return value
+
+
+# Discs on the edges, corners excluded
+def compute_edge(board, color):
+    opponent = 1 if color == 2 else 2
+    n = len(board)
+    value = 0
+    for k in range(1, n - 1):
+        for v in (board[0][k], board[n - 1][k], board[k][0], board[k][n - 1]):
+            if v == color:
+                value += 1
+            elif v == opponent:
+                value -= 1
+    return value
+
+
+def load_weights(path, weights, features):
+    """
+    Replace the weights dict in place with the weights written by
+    othello_tune.py, which must all name one of the features.
+    """
+    with open(path) as f:
+        loaded = json.load(f)["weights"]
+    for name in loaded:
+        if name not in features:
+            raise ValueError("Unknown heuristic feature: {}".format(name))
+    weights.clear()
+    weights.update(loaded)
+
+
+def weighted_sum(board, color, weights, features):
+    value = 0
+    for name, weight in weights.items():
+        value += weight * features[name](board, color)
+    return value
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module counts the leaf positions of the full game tree to a given
+depth (perft), to measure and verify move generation on its own.
+
+A player who cannot move but whose opponent can passes, and the pass counts
+as a move. A position where neither player can move is a leaf even before
+the depth is reached. Counts are taken with a backend, any module with
+othello_shared's get_possible_moves and play_move, so a faster move
+generator can be checked against the known counts of othello_shared:
+
+    python3 othello_perft.py -d 8 -n 6            # counts and nodes/second
+    python3 othello_perft.py -d 8 -n 7 -v         # check against KNOWN_COUNTS
+    python3 othello_perft.py -d 6 -n 5 -D         # count per first move
+    python3 othello_perft.py -p "000000000000002100001200000000000000 2" -n 4
+    python3 othello_perft.py -b my_movegen -d 8 -n 7 -v
+"""
+import sys, getopt
+import importlib
+import time
+
+from othello_game import OthelloGameManager
+from othello_protocol import decode_board
+
+# Leaf counts of othello_shared from the initial board for depths 1, 2, ..., by board size.
+# The 8x8 counts are the published ones; the 4x4 counts end in the 60060 possible games.
+KNOWN_COUNTS = {
+    4: [4, 12, 44, 128, 424, 1256, 3624, 9116, 20044, 36540, 50704, 57436, 59564, 59980, 60060, 60060],
+    6: [4, 12, 56, 244, 1364, 7604, 47740, 308716, 2114912],
+    8: [4, 12, 56, 244, 1396, 8200, 55092, 390216],
+}
+
+
+def perft(board, color, depth, engine):
+    """
+    Number of leaf positions depth moves from board, color to move.
+    """
+    if depth == 0:
+        return 1
+    moves = engine.get_possible_moves(board, color)
+    opponent = 1 if color == 2 else 2
+    if not moves:
+        if not engine.get_possible_moves(board, opponent):
+            return 1  # game over
+        return perft(board, opponent, depth - 1, engine)  # pass
+    if depth == 1:
+        return len(moves)
+    total = 0
+    for i, j in moves:
+        total += perft(engine.play_move(board, color, i, j), opponent, depth - 1, engine)
+    return total
+
+
+def divide(board, color, depth, engine):
+    """
+    Leaf counts below each first move, as a list of (move, count); the move
+    is None for a pass.
+    """
+    moves = engine.get_possible_moves(board, color)
+    opponent = 1 if color == 2 else 2
+    if depth == 0 or not moves:
+        return [(None, perft(board, color, depth, engine))]
+    return [((i, j), perft(engine.play_move(board, color, i, j), opponent, depth - 1, engine)) for i, j in moves]
+
+
+def parse_position(text):
+    """
+    (board, color) from "<n*n digits> [color]", as in othello_batch.
+    """
+    fields = text.split()
+    return decode_board(fields[0], 2), int(fields[1]) if len(fields) > 1 else 1
+
+
+def main(argv):
+
+    usage = 'othello_perft.py [-d <size> | -p "<board digits> <color>"] [-n <max depth>] [-D] [-v] [-b <backend module>]'
+    size = 8
+    position = None
+    max_depth = 6
+    split = False
+    verify = False
+    backend = "othello_shared"
+
+    try:
+        opts, args = getopt.getopt(argv, "hd:p:n:Dvb:", ["backend="])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-d":
+            size = int(arg)
+        elif opt == "-p":
+            position = arg
+        elif opt == "-n":
+            max_depth = int(arg)
+        elif opt == "-D":
+            split = True
+        elif opt == "-v":
+            verify = True
+        elif opt in ("-b", "--backend"):
+            backend = arg
+
+    engine = importlib.import_module(backend)
+    if position is not None:
+        board, color = parse_position(position)
+        known = []
+    else:
+        board, color = tuple(tuple(row) for row in OthelloGameManager(size).board), 1
+        known = KNOWN_COUNTS.get(size, [])
+    if verify and not known:
+        print("No known counts for this position")
+        sys.exit(2)
+
+    if split:
+        start = time.perf_counter()
+        counts = divide(board, color, max_depth, engine)
+        for move, count in counts:
+            print("{:>7} {}".format("pass" if move is None else "{},{}".format(*move), count))
+        total = sum(count for _, count in counts)
+        print("total {} in {:.2f}s".format(total, time.perf_counter() - start))
+        return
+
+    failed = 0
+    print("{:>5} {:>14} {:>10} {:>12}  {}".format("depth", "leaves", "seconds", "leaves/s", ""))
+    for depth in range(1, max_depth + 1):
+        start = time.perf_counter()
+        count = perft(board, color, depth, engine)
+        seconds = time.perf_counter() - start
+        note = ""
+        if depth <= len(known):
+            note = "ok" if count == known[depth - 1] else "MISMATCH, expected {}".format(known[depth - 1])
+            failed += count != known[depth - 1]
+        print("{:>5} {:>14} {:>10.3f} {:>12.0f}  {}".format(depth, count, seconds, count / seconds if seconds else 0, note))
+    if verify and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,97 @@
+"""
+This module contains a pool of long-lived AI processes that are reused
+across games instead of starting a new python3 process for every game.
+
+Check a player out of the pool instead of creating an AiPlayerInterface;
+play_game ends the game with player.kill(), which hands a pooled player back
+to the pool instead of killing it:
+
+    pool = AgentPool()
+    for n in range(100):
+        p1 = pool.checkout("agent.py", 1, 4, caching=True)
+        p2 = pool.checkout("randy_ai.py", 2, 4)
+        play_game(OthelloGameManager(6), p1, p2)
+    pool.close()
+
+Reuse needs protocol 4 (see othello_protocol); older AIs are killed after
+their game like before. Workers that crashed or timed out are replaced.
+"""
+
+import subprocess
+
+from othello_game import AiPlayerInterface
+
+
+class PooledAiPlayer(AiPlayerInterface):
+
+    def __init__(self, pool, filename):
+        self.pool = pool
+        self.filename = filename
+        self.start(filename)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self, manager):
+        if not self.timed_out and self.alive() and self.finish(manager):
+            self.pool.release(self)
+        else:
+            self.pool.discard(self)
+
+
+class AgentPool(object):
+
+    def __init__(self, max_idle=8):
+        """
+        Keep at most max_idle idle workers per AI file.
+        """
+        self.max_idle = max_idle
+        self.idle = {}
+        self.stats = {"spawned": 0, "reused": 0, "replaced": 0}
+
+    def checkout(self, filename, color, limit, minimax = False, caching = False, ordering = False):
+        """
+        Return a player for a new game, reusing an idle worker if possible.
+        """
+        workers = self.idle.get(filename, [])
+        while workers:
+            worker = workers.pop()
+            if worker.alive():
+                try:
+                    worker.configure(color, limit, minimax, caching, ordering, reset=True)
+                    self.stats["reused"] += 1
+                    return worker
+                except OSError:
+                    pass
+            self.stats["replaced"] += 1
+            self.stop(worker)
+        worker = PooledAiPlayer(self, filename)
+        worker.configure(color, limit, minimax, caching, ordering)
+        self.stats["spawned"] += 1
+        return worker
+
+    def release(self, worker):
+        workers = self.idle.setdefault(worker.filename, [])
+        if worker.protocol >= 4 and len(workers) < self.max_idle:
+            workers.append(worker)
+        else:
+            self.stop(worker)
+
+    def discard(self, worker):
+        self.stats["replaced"] += 1
+        self.stop(worker)
+
+    def stop(self, worker):
+        try:
+            worker.process.stdin.close()
+            worker.process.wait(AiPlayerInterface.FINAL_GRACE)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        worker.process.kill()
+        worker.selector.close()
+
+    def close(self):
+        for workers in self.idle.values():
+            for worker in workers:
+                self.stop(worker)
+        self.idle.clear()
@@ -0,0 +1,58 @@
+"""
+This module contains the position sets shared by the autograder, the
+benchmarks and the test tools: the autograder's fixed small (4x4) and big
+(6x6) boards, and random positions reachable from the initial board.
+"""
+
+import random
+
+from othello_game import OthelloGameManager
+from othello_shared import get_possible_moves, play_move
+
+smallboards = [((0, 0, 0, 0), (0, 2, 1, 0), (0, 1, 1, 1), (0, 0, 0, 0)),
+               ((0, 1, 0, 0), (0, 1, 1, 0), (0, 1, 2, 1), (0, 0, 0, 2)),
+               ((0, 0, 0, 0), (0, 2, 1, 0), (0, 1, 1, 1), (0, 1, 1, 0)),
+               ((0, 1, 0, 0), (0, 2, 2, 0), (0, 1, 2, 1), (0, 0, 2, 2)),
+               ((1, 0, 0, 2), (1, 1, 2, 0), (1, 1, 1, 1), (1, 2, 2, 2)),
+               ((0, 1, 0, 0), (0, 1, 1, 0), (2, 2, 2, 1), (0, 0, 0, 2))]
+
+bigboards = [((0, 0, 0, 0, 0, 0), (0, 0, 2, 2, 0, 0), (0, 1, 1, 2, 2, 0), (2, 2, 1, 2, 0, 0), (0, 1, 0, 1, 2, 0),
+              (0, 0, 0, 0, 0, 0)),
+             ((0, 0, 0, 0, 0, 0), (0, 0, 1, 2, 0, 0), (0, 1, 1, 1, 1, 0), (2, 2, 1, 2, 0, 0), (0, 1, 0, 1, 2, 0),
+              (0, 0, 0, 0, 0, 0)),
+             ((0, 0, 0, 0, 1, 0), (0, 0, 1, 1, 0, 0), (0, 1, 1, 1, 1, 0), (2, 2, 1, 2, 0, 0), (0, 2, 0, 1, 2, 0),
+              (0, 0, 2, 2, 1, 0)),
+             ((0, 0, 0, 0, 0, 0), (0, 0, 0, 2, 0, 0), (0, 1, 2, 2, 2, 0), (0, 2, 2, 2, 0, 0), (0, 1, 0, 0, 0, 0),
+              (0, 0, 0, 0, 0, 0)),
+             ((0, 0, 0, 0, 0, 0), (0, 0, 0, 2, 0, 0), (0, 1, 2, 1, 1, 0), (0, 2, 2, 2, 0, 0), (0, 1, 0, 0, 0, 0),
+              (0, 0, 0, 0, 0, 0))]
+
+
+def random_position(dimension, rng, max_plies=None, min_plies=0):
+    """
+    Play min_plies to max_plies random moves from the initial board and
+    return (board, color) for a position where color has a legal move.
+    """
+    if max_plies is None:
+        max_plies = dimension * dimension - 5
+    while True:
+        board = tuple(tuple(row) for row in OthelloGameManager(dimension).board)
+        color = 1
+        plies = rng.randrange(min_plies, max_plies + 1)
+        for _ in range(plies):
+            moves = get_possible_moves(board, color)
+            if not moves:
+                break
+            i, j = rng.choice(moves)
+            board = play_move(board, color, i, j)
+            color = 1 if color == 2 else 2
+        if get_possible_moves(board, color):
+            return board, color
+
+
+def random_positions(dimension, count, seed=0, max_plies=None):
+    """
+    count random (board, color) positions, the same ones for the same seed.
+    """
+    rng = random.Random(seed)
+    return [random_position(dimension, rng, max_plies) for _ in range(count)]
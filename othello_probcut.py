@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module fits the ProbCut model used by agent.py's selective search.
+
+For every configured (deep, shallow) depth pair it searches random positions
+at both depths, records the value pairs and fits deep = a * shallow + b by
+least squares. The standard deviation of the residuals is sigma. The model
+is written as JSON; point the agent at it with OTHELLO_PROBCUT=<file>.
+
+The recorded samples can be saved (-r) and refitted later (-i) without
+searching again.
+"""
+import sys, getopt
+import json
+import random
+
+import agent
+from othello_positions import random_position
+
+
+def search_value(board, color, depth):
+    agent.clear_caches()
+    _, value = agent.alphabeta_max_node(board, color, float("-inf"), float("inf"), depth, 1, 1)
+    return value
+
+
+def record_samples(dimension, pairs, count, seed=0):
+    """
+    Return a list of {"deep", "shallow", "v_deep", "v_shallow"} samples.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for n in range(count):
+        board, color = random_position(dimension, rng)
+        for deep, shallow in pairs:
+            samples.append({"deep": deep, "shallow": shallow,
+                            "v_deep": search_value(board, color, deep),
+                            "v_shallow": search_value(board, color, shallow)})
+        print("position {}/{}".format(n + 1, count), file=sys.stderr)
+    return samples
+
+
+def fit_model(samples, threshold=1.5):
+    """
+    Fit one linear model per deep depth and return the JSON-ready model.
+    """
+    by_depth = {}
+    for sample in samples:
+        by_depth.setdefault((sample["deep"], sample["shallow"]), []).append(
+            (sample["v_shallow"], sample["v_deep"]))
+    depths = {}
+    for (deep, shallow), points in sorted(by_depth.items()):
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if n < 3 or var_x == 0:
+            continue
+        a = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+        if a <= 0:
+            continue
+        b = mean_y - a * mean_x
+        sigma = (sum((y - a * x - b) ** 2 for x, y in points) / (n - 2)) ** 0.5
+        depths[str(deep)] = {"shallow": shallow, "a": a, "b": b, "sigma": sigma, "samples": n}
+    return {"threshold": threshold, "depths": depths}
+
+
+def parse_pairs(text):
+    pairs = []
+    for item in text.split(","):
+        deep, shallow = item.split(":")
+        pairs.append((int(deep), int(shallow)))
+    return pairs
+
+
+def main(argv):
+
+    usage = 'othello_probcut.py -o <model.json> [-d <dimension> -n <positions> -p <deep:shallow,...> -t <threshold> -s <seed> -r <samples.jsonl> -i <samples.jsonl>]'
+    dimension = 6
+    count = 100
+    pairs = [(4, 2), (5, 3), (6, 2), (7, 3)]  # same parity, values swing between odd and even depths
+    threshold = 1.5
+    seed = 0
+    output = None
+    record = None
+    samples_in = None
+
+    try:
+        opts, args = getopt.getopt(argv, "hd:n:p:t:s:o:r:i:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-d":
+            dimension = int(arg)
+        elif opt == "-n":
+            count = int(arg)
+        elif opt == "-p":
+            pairs = parse_pairs(arg)
+        elif opt == "-t":
+            threshold = float(arg)
+        elif opt == "-s":
+            seed = int(arg)
+        elif opt == "-o":
+            output = arg
+        elif opt == "-r":
+            record = arg
+        elif opt == "-i":
+            samples_in = arg
+
+    if output is None:
+        print(usage)
+        sys.exit(2)
+
+    if samples_in is not None:
+        with open(samples_in) as f:
+            samples = [json.loads(line) for line in f if line.strip()]
+    else:
+        samples = record_samples(dimension, pairs, count, seed)
+        if record is not None:
+            with open(record, "w") as f:
+                for sample in samples:
+                    f.write(json.dumps(sample) + "\n")
+
+    model = fit_model(samples, threshold)
+    with open(output, "w") as f:
+        json.dump(model, f, indent=2)
+    for deep, fit in sorted(model["depths"].items()):
+        print("depth {} from {}: a={:.3f} b={:.3f} sigma={:.3f} ({} samples)".format(
+            deep, fit["shallow"], fit["a"], fit["b"], fit["sigma"], fit["samples"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
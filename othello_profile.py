@@ -0,0 +1,78 @@
+"""
+This module contains an opt-in profiler for the AI players' run_ai loops.
+
+Set the OTHELLO_PROFILE environment variable to a directory before starting
+a game (the game manager passes its environment on to the AI processes):
+
+    OTHELLO_PROFILE=/tmp/prof python3 othello_gui.py -d 8 -a agent.py
+
+Each move selection is then run under cProfile and written to
+<dir>/<pid>_<game>/move_<n>.prof. When the agent receives FINAL, the per-move
+profiles are merged into game.prof and the hottest functions are written to
+summary.txt. All .prof files can be loaded with pstats.
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+
+PROFILE_ENV = "OTHELLO_PROFILE"
+SUMMARY_LINES = 25
+
+game_numbers = itertools.count(1)  # an AI process may play several games
+
+
+class MoveProfiler(object):
+
+    def __init__(self, directory, sort="cumulative"):
+        self.directory = os.path.join(directory, "{}_{}".format(os.getpid(), next(game_numbers)))
+        os.makedirs(self.directory, exist_ok=True)
+        self.sort = sort
+        self.move_files = []
+
+    def profile_move(self, func, *args):
+        """
+        Call func(*args) under cProfile, dump the profile of this single
+        call to its own file and return func's result.
+        """
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func, *args)
+        path = os.path.join(self.directory, "move_{:03d}.prof".format(len(self.move_files) + 1))
+        profiler.dump_stats(path)
+        self.move_files.append(path)
+        return result
+
+    def finish(self):
+        """
+        Merge the per-move profiles into game.prof and write the top hot
+        functions to summary.txt. Returns the summary path, or None if no
+        move was profiled.
+        """
+        if not self.move_files:
+            return None
+        stats = pstats.Stats(self.move_files[0])
+        for path in self.move_files[1:]:
+            stats.add(path)
+        stats.dump_stats(os.path.join(self.directory, "game.prof"))
+
+        out = io.StringIO()
+        stats.stream = out
+        out.write("{} moves profiled\n\n".format(len(self.move_files)))
+        stats.sort_stats("tottime").print_stats(SUMMARY_LINES)
+        stats.sort_stats(self.sort).print_stats(SUMMARY_LINES)
+        summary = os.path.join(self.directory, "summary.txt")
+        with open(summary, "w") as f:
+            f.write(out.getvalue())
+        return summary
+
+
+def profiler_from_env():
+    """
+    Return a MoveProfiler if OTHELLO_PROFILE is set, otherwise None.
+    """
+    directory = os.environ.get(PROFILE_ENV)
+    if not directory:
+        return None
+    return MoveProfiler(directory)
@@ -0,0 +1,172 @@
+"""
+This module contains the message formats shared by the game manager and the
+AI players.
+
+Protocol versions:
+  1: the board is sent as the Python repr of a list of rows.
+  2: the board is sent as one line of n*n digits, row by row.
+  3: move deltas. The AI keeps its own board: the manager sends the board once
+     ("BOARD <digits>") and from then on only the moves played since the AI's
+     last move ("DELTA <checksum> i,j ..."; no moves means the opponent
+     passed). Every few turns the checksum of the manager's board is sent
+     instead of "-"; an AI whose board differs answers "RESYNC" and is sent
+     the full board again.
+  4: reusable AIs. After FINAL the AI waits for "RESET <setup line>" and
+     plays another game with the new settings; end of input ends it.
+  5: search progress. Before its move the AI may send any number of
+     "INFO depth <d> nodes <n> time <seconds> score <value> pv i,j ..."
+     lines, e.g. one per completed iteration of a deepening search. The
+     manager only chooses version 5 when it reads these lines.
+
+An AI announces the highest version it speaks after a tab on its name line
+("Othello AI\tPROTOCOL 2"). The manager answers with the version to use as
+an extra field of the setup line ("1,4,0,1,1,2"). AIs that announce nothing
+get version 1, and an AI that is sent no version uses version 1, so old
+managers and old AIs keep working.
+"""
+
+import ast
+import zlib
+from math import isqrt
+
+from othello_shared import play_move
+
+PROTOCOL_VERSION = 5
+CHECK_INTERVAL = 8  # turns between board checksums in protocol 3
+MOVE_TIMEOUT = 10  # seconds the manager waits for a move
+INFO_VERSION = 5  # first version with INFO lines
+
+
+def introduction(name, version=PROTOCOL_VERSION):
+    """
+    The first line an AI prints: its name and the protocol it speaks.
+    """
+    return "{}\tPROTOCOL {}".format(name, version)
+
+
+def parse_introduction(line):
+    """
+    Return (name, protocol version) from an AI's first line.
+    """
+    name, _, capabilities = line.strip().partition("\t")
+    version = 1
+    fields = capabilities.split()
+    if len(fields) >= 2 and fields[0] == "PROTOCOL":
+        version = int(fields[1])
+    return name, version
+
+
+def negotiate(version, info=False):
+    """
+    Protocol version for an AI that announced the given version. Version 5
+    is only chosen if the manager wants search progress (info), since
+    reporting it costs the AI time.
+    """
+    return min(version, PROTOCOL_VERSION if info else INFO_VERSION - 1)
+
+
+def setup_version(arguments):
+    """
+    Protocol version from the fields of the setup line.
+    """
+    return int(arguments[5]) if len(arguments) > 5 else 1
+
+
+def next_game(version):
+    """
+    After FINAL, wait for the manager to start another game. Returns the
+    new setup line, or None if the AI should exit.
+    """
+    if version < 4:
+        return None
+    try:
+        line = input()
+    except EOFError:
+        return None
+    if line.startswith("RESET "):
+        return line[len("RESET "):]
+    return None
+
+
+def encode_board(board, version):
+    if version >= 2:
+        return "".join([str(x) for row in board for x in row])
+    return str(board)
+
+
+def decode_board(line, version):
+    """
+    Turn a board line into a tuple of row tuples. The squares are
+    0 : empty square
+    1 : dark disk (player 1)
+    2 : light disk (player 2)
+    """
+    line = line.strip()
+    if version >= 2:
+        n = isqrt(len(line))
+        return tuple(tuple(map(int, line[k:k + n])) for k in range(0, n * n, n))
+    return tuple(tuple(row) for row in ast.literal_eval(line))
+
+
+def board_checksum(board):
+    return "{:08x}".format(zlib.crc32(encode_board(board, 2).encode("ASCII")))
+
+
+def encode_delta(moves, board=None):
+    """
+    DELTA line for the moves (i,j) played since the AI's last move. The
+    checksum of board is included if a board is given.
+    """
+    check = "-" if board is None else board_checksum(board)
+    return " ".join(["DELTA", check] + ["{},{}".format(i, j) for i, j in moves])
+
+
+def read_position(version, board, color):
+    """
+    Read the manager's message for one turn from stdin and return
+    (status, board), where status is "FINAL" when the game is over.
+    With protocol 3 board is the AI's own copy of the position, which the
+    received moves are applied to; pass None before the first turn.
+    """
+    fields = input().split()
+    if fields[0] == "FINAL" or version < 3:
+        # "SCORE 2 2" or "FINAL 33 31", the scores of dark and light, then the board.
+        if fields[0] == "FINAL":
+            return fields[0], board
+        return fields[0], decode_board(input(), version)
+    while True:
+        if fields[0] == "BOARD":
+            return fields[0], decode_board(fields[1], 2)
+        if board is not None:
+            opponent = 1 if color == 2 else 2
+            for move in fields[2:]:
+                i, j = move.split(",")
+                board = play_move(board, opponent, int(i), int(j))
+            if fields[1] == "-" or fields[1] == board_checksum(board):
+                return fields[0], board
+        print("RESYNC", flush=True)
+        fields = input().split()
+
+
+def encode_info(depth, nodes, seconds, value, pv):
+    """
+    INFO line for a completed search to depth, with its principal
+    variation pv, a list of moves (i,j).
+    """
+    return "INFO depth {} nodes {} time {:.3f} score {} pv {}".format(
+        depth, nodes, seconds, value, " ".join(["{},{}".format(i, j) for i, j in pv]))
+
+
+def parse_info(line):
+    """
+    Return the fields of an INFO line as a dict with depth, nodes, time,
+    nps, score and pv.
+    """
+    fields = line.split()
+    k = fields.index("pv")
+    info = dict(zip(fields[1:k:2], fields[2:k:2]))
+    seconds = float(info["time"])
+    nodes = int(info["nodes"])
+    return {"depth": int(info["depth"]), "nodes": nodes, "time": seconds,
+            "nps": int(nodes / seconds) if seconds > 0 else 0, "score": float(info["score"]),
+            "pv": [tuple(map(int, move.split(","))) for move in fields[k + 1:]]}
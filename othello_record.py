@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains a compact binary format for game records, with a
+streaming writer and a lazy reader.
+
+A record file starts with the magic bytes b"OTHR" and a format version byte,
+followed by any number of games. Each game is
+
+    size        1 byte, the board dimension n
+    flags       1 byte, bit 0 set if the game starts from a custom position
+    dark name   1 byte length + UTF-8
+    light name  1 byte length + UTF-8
+    [position]  only with flag bit 0: n*n bytes of squares (0, 1, 2) and
+                1 byte for the player to move
+    moves       one byte per move, i*n + j, 0xFF for a pass, and 0xFE to
+                end the game
+
+Boards bigger than 15x15 use two big-endian bytes per move, with 0xFFFF
+for a pass and 0xFFFE to end the game. Games are written and read one at a
+time, so files with millions of games are never loaded whole:
+
+    writer = RecordWriter("games.othr")
+    writer.write_game(6, "agent.py", "randy_ai.py", [(1, 2, 3), (2, 2, 2)])
+    writer.close()
+    for record in read_records("games.othr"):
+        for board, player, move in replay(record):
+            ...
+
+    python3 othello_record.py games.othr        # one line per game
+    python3 othello_record.py -v -g 3 games.othr  # replay game 3
+"""
+import sys, getopt
+import struct
+from collections import namedtuple
+
+import othello_shared
+
+MAGIC = b"OTHR"
+FORMAT_VERSION = 1
+CUSTOM_START = 1
+
+PASS = 0xFF
+END = 0xFE
+WIDE_PASS = 0xFFFF
+WIDE_END = 0xFFFE
+
+# moves is a list of (i, j), or None for a pass. board and player are the
+# starting position (board is None for the initial board).
+GameRecord = namedtuple("GameRecord", ["size", "dark", "light", "board", "player", "moves"])
+
+
+class RecordError(ValueError):
+    pass
+
+
+def initial_board(size):
+    board = [[0] * size for _ in range(size)]
+    i = j = size // 2 - 1
+    board[i][j] = 2
+    board[i + 1][j + 1] = 2
+    board[i + 1][j] = 1
+    board[i][j + 1] = 1
+    return tuple(tuple(row) for row in board)
+
+
+def encode_name(name):
+    data = name.encode("UTF-8")[:255]
+    return bytes([len(data)]) + data
+
+
+class RecordWriter(object):
+    """
+    Appends games to a record file. A game is either written whole with
+    write_game, or streamed with begin_game, move (None for a pass) and
+    end_game as it is played.
+    """
+
+    def __init__(self, path, append = True):
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC + bytes([FORMAT_VERSION]))
+        self.size = None
+
+    def begin_game(self, size, dark, light, board = None, player = 1):
+        if size * size >= WIDE_END:
+            raise RecordError("Board too large: {}".format(size))
+        self.size = size
+        self.wide = size > 15
+        custom = board is not None and tuple(tuple(row) for row in board) != initial_board(size)
+        header = bytes([size, CUSTOM_START if custom else 0]) + encode_name(dark) + encode_name(light)
+        if custom:
+            header += bytes([x for row in board for x in row]) + bytes([player])
+        self.file.write(header)
+
+    def write_code(self, code):
+        self.file.write(struct.pack(">H", code) if self.wide else bytes([code]))
+
+    def move(self, move):
+        if move is None:
+            self.write_code(WIDE_PASS if self.wide else PASS)
+        else:
+            i, j = move
+            self.write_code(i * self.size + j)
+
+    def end_game(self):
+        self.write_code(WIDE_END if self.wide else END)
+        self.file.flush()
+        self.size = None
+
+    def write_game(self, size, dark, light, moves, board = None, player = 1):
+        """
+        Write a whole game. moves are (player, i, j) as in
+        OthelloGameManager.moves; passes are recorded wherever the same
+        player moves twice in a row.
+        """
+        self.begin_game(size, dark, light, board, player)
+        to_move = player
+        for mover, i, j in moves:
+            if mover != to_move:
+                self.move(None)
+            self.move((i, j))
+            to_move = 1 if mover == 2 else 2
+        self.end_game()
+
+    def close(self):
+        self.file.close()
+
+
+def read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise RecordError("Truncated record")
+    return data
+
+
+def read_name(f):
+    return read_exact(f, read_exact(f, 1)[0]).decode("UTF-8")
+
+
+def read_game(f):
+    """
+    Read the next game from the open file f. Returns None at the end of
+    the file.
+    """
+    first = f.read(1)
+    if not first:
+        return None
+    size = first[0]
+    flags = read_exact(f, 1)[0]
+    dark = read_name(f)
+    light = read_name(f)
+    board, player = None, 1
+    if flags & CUSTOM_START:
+        squares = read_exact(f, size * size)
+        board = tuple(tuple(squares[k:k + size]) for k in range(0, size * size, size))
+        player = read_exact(f, 1)[0]
+    moves = []
+    if size > 15:
+        while True:
+            code = struct.unpack(">H", read_exact(f, 2))[0]
+            if code == WIDE_END:
+                break
+            moves.append(None if code == WIDE_PASS else divmod(code, size))
+    else:
+        while True:
+            code = read_exact(f, 1)[0]
+            if code == END:
+                break
+            moves.append(None if code == PASS else divmod(code, size))
+    return GameRecord(size, dark, light, board, player, moves)
+
+
+def read_records(path):
+    """
+    Yield the GameRecords of a record file one at a time.
+    """
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC:
+            raise RecordError("{} is not a game record file".format(path))
+        if header[len(MAGIC)] > FORMAT_VERSION:
+            raise RecordError("Unsupported record format version {}".format(header[len(MAGIC)]))
+        while True:
+            record = read_game(f)
+            if record is None:
+                return
+            yield record
+
+
+def replay(record, engine = othello_shared):
+    """
+    Yield (board, player to move, move) for every move of a record, with the
+    board before the move; the move is None for a pass. engine is any module
+    with othello_shared's play_move, e.g. a faster move generator.
+    """
+    board = record.board if record.board is not None else initial_board(record.size)
+    player = record.player
+    for move in record.moves:
+        yield board, player, move
+        if move is not None:
+            board = engine.play_move(board, player, move[0], move[1])
+        player = 1 if player == 2 else 2
+
+
+def final_board(record, engine = othello_shared):
+    board = record.board if record.board is not None else initial_board(record.size)
+    player = record.player
+    for move in record.moves:
+        if move is not None:
+            board = engine.play_move(board, player, move[0], move[1])
+        player = 1 if player == 2 else 2
+    return board
+
+
+def main(argv):
+
+    usage = 'othello_record.py [-v] [-g <game number>] <records file>'
+    verbose = False
+    number = None
+
+    try:
+        opts, args = getopt.getopt(argv, "hvg:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-v":
+            verbose = True
+        elif opt == "-g":
+            number = int(arg)
+    if len(args) != 1:
+        print(usage)
+        sys.exit(2)
+
+    for n, record in enumerate(read_records(args[0]), 1):
+        if number is not None and n != number:
+            continue
+        dark, light = othello_shared.get_score(final_board(record))
+        print("game {}: {}x{} {} (dark) {}:{} {} (light), {} moves".format(
+            n, record.size, record.size, record.dark, dark, light, record.light, len(record.moves)))
+        if verbose:
+            for board, player, move in replay(record):
+                for row in board:
+                    print(" ".join(str(x) for x in row))
+                print("{} {}".format("dark" if player == 1 else "light",
+                                     "passes" if move is None else "plays {},{}".format(*move)))
+                print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
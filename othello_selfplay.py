@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module generates labelled positions for evaluation tuning by letting an
+agent play itself.
+
+Every game starts with a few random moves, so that games differ. After that
+both colours are played by the agent's alpha-beta search, and each position
+is stored with the search score and the final result. Games run in a
+process pool. Positions are written to a directory of append-only record
+files that are read back as memory-mapped NumPy arrays:
+
+    <dir>/meta.json          board size and number of shards
+    <dir>/shard_<k>.bin      positions whose hash % shards == k
+
+A record (see record_dtype) holds the dark and light discs as packed bit
+masks, the colour to move, the search score from the mover's point of view,
+the final disc difference (dark - light) and the position's Zobrist hash.
+A position already in the dataset is not written again, even across runs
+into the same directory.
+
+    python3 othello_selfplay.py -a agent.py -d 6 -n 1000 -l 3 -p 6 -f data6
+    python3 othello_selfplay.py -a agent.py -d 8 -n 20000 -l 2 -s 16 -f data8
+
+    data = load_dataset("data6")          # one array over all shards
+    boards = unpack_boards(data, 6)       # (N, 6, 6) int8 of 0, 1, 2
+"""
+import sys, getopt
+import json
+import os
+import random
+import multiprocessing
+
+import numpy as np
+
+from othello_game import OthelloGameManager, load_agent_module
+from othello_shared import get_possible_moves, play_move, get_score
+from othello_tt import zobrist_hash
+
+agent = None
+
+
+def record_dtype(size):
+    mask_bytes = (size * size + 7) // 8
+    return np.dtype([("dark", "u1", (mask_bytes,)), ("light", "u1", (mask_bytes,)), ("to_move", "u1"),
+                     ("score", "<f4"), ("result", "<i2"), ("hash", "<u8")])
+
+
+def pack_boards(boards, size):
+    """
+    Packed (dark, light) bit masks of an (N, size, size) array of boards.
+    """
+    flat = boards.reshape(len(boards), size * size)
+    return np.packbits(flat == 1, axis=1), np.packbits(flat == 2, axis=1)
+
+
+def unpack_boards(records, size):
+    """
+    (N, size, size) int8 boards of 0, 1 and 2 from dataset records.
+    """
+    n = size * size
+    dark = np.unpackbits(records["dark"], axis=1, count=n).astype(np.int8)
+    light = np.unpackbits(records["light"], axis=1, count=n).astype(np.int8)
+    return (dark + 2 * light).reshape(len(records), size, size)
+
+
+def sorted_contains(sorted_hashes, hashes):
+    """
+    Boolean array: which of hashes are in the sorted array sorted_hashes.
+    """
+    index = np.searchsorted(sorted_hashes, hashes)
+    found = np.zeros(len(hashes), dtype=bool)
+    inside = index < len(sorted_hashes)
+    found[inside] = sorted_hashes[index[inside]] == hashes[inside]
+    return found
+
+
+class DatasetWriter(object):
+    """
+    Appends records to the shard files of a dataset directory, skipping
+    positions that are already in the dataset. The hashes written so far are
+    kept as one sorted uint64 array per shard, 8 bytes per position.
+    """
+
+    def __init__(self, directory, size, shards=1):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["size"] != size:
+                raise ValueError("{} holds {}x{} positions".format(directory, meta["size"], meta["size"]))
+            shards = meta["shards"]
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"size": size, "shards": shards}, f)
+        self.size = size
+        self.shards = shards
+        self.dtype = record_dtype(size)
+        self.files = []
+        self.seen = []
+        for k in range(shards):
+            path = shard_path(directory, k)
+            self.seen.append(np.unique(read_shard(path, self.dtype)["hash"]))
+            self.files.append(open(path, "ab"))
+        self.stats = {"written": 0, "duplicates": 0}
+
+    def write(self, positions):
+        """
+        positions are (board, to_move, score, result) tuples.
+        """
+        records = np.zeros(len(positions), dtype=self.dtype)
+        boards = np.array([board for board, _, _, _ in positions], dtype=np.int8)
+        if len(positions):
+            records["dark"], records["light"] = pack_boards(boards, self.size)
+            records["to_move"] = [to_move for _, to_move, _, _ in positions]
+            records["score"] = [score for _, _, score, _ in positions]
+            records["result"] = [result for _, _, _, result in positions]
+            records["hash"] = [zobrist_hash(board, to_move, to_move) for board, to_move, _, _ in positions]
+        keep = np.zeros(len(records), dtype=bool)
+        _, first = np.unique(records["hash"], return_index=True)  # a position repeated within positions is kept once
+        keep[first] = True
+        shard_of = records["hash"] % np.uint64(self.shards)
+        for k in range(self.shards):
+            in_shard = keep & (shard_of == k)
+            hashes = records["hash"][in_shard]
+            new = ~sorted_contains(self.seen[k], hashes)
+            keep[in_shard] = new
+            new_hashes = np.sort(hashes[new])
+            self.seen[k] = np.insert(self.seen[k], np.searchsorted(self.seen[k], new_hashes), new_hashes)
+        self.stats["written"] += int(keep.sum())
+        self.stats["duplicates"] += int(len(keep) - keep.sum())
+        for k in range(self.shards):
+            self.files[k].write(records[keep & (shard_of == k)].tobytes())
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def shard_path(directory, k):
+    return os.path.join(directory, "shard_{:03d}.bin".format(k))
+
+
+def read_shard(path, dtype):
+    """
+    Memory map a shard file; an empty or missing shard gives an empty array.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    count = os.path.getsize(path) // dtype.itemsize
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def load_shards(directory):
+    """
+    Return (size, list of memory-mapped shard arrays) of a dataset.
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    dtype = record_dtype(meta["size"])
+    return meta["size"], [read_shard(shard_path(directory, k), dtype) for k in range(meta["shards"])]
+
+
+def load_dataset(directory):
+    """
+    All records of a dataset in one array (shards are concatenated, so this
+    reads them into memory; use load_shards to stay memory-mapped).
+    """
+    size, shards = load_shards(directory)
+    return np.concatenate(shards) if shards else np.zeros(0, dtype=record_dtype(size))
+
+
+def init_worker(filename):
+    global agent
+    agent = load_agent_module(filename)
+
+
+def search(board, color, settings):
+    """
+    Best move and its value for color with the agent's alpha-beta search.
+    """
+    if hasattr(agent, "clear_caches"):
+        agent.clear_caches()
+    else:
+        agent.caching_states.clear()
+    return agent.alphabeta_max_node(board, color, float("-inf"), float("inf"), settings["limit"],
+                                    settings["caching"], settings["ordering"])
+
+
+def self_play(args):
+    """
+    Play one game and return its (board, to_move, score, result) positions.
+    Random opening moves are played but not recorded.
+    """
+    number, size, settings = args
+    rng = random.Random(settings["seed"] * 1000003 + number)
+    board = tuple(tuple(row) for row in OthelloGameManager(size).board)
+    color = 1
+    positions = []
+    ply = 0
+    while True:
+        moves = get_possible_moves(board, color)
+        if not moves:
+            break  # the game manager ends the game when the player to move cannot move
+        if ply < settings["plies"]:
+            move = rng.choice(moves)
+        else:
+            move, score = search(board, color, settings)
+            positions.append((board, color, score))
+        board = play_move(board, color, move[0], move[1])
+        color = 1 if color == 2 else 2
+        ply += 1
+    dark, light = get_score(board)
+    return [(b, to_move, score, dark - light) for b, to_move, score in positions]
+
+
+def main(argv):
+
+    usage = 'othello_selfplay.py -a <agent> -f <dataset dir> [-d <size>] [-n <games>] [-l <depth-limit> -c -o] [-p <random opening plies>] [-s <shards>] [-S <seed>] [-j <workers>]'
+    filename = "agent.py"
+    directory = None
+    size = 8
+    games = 100
+    shards = 1
+    workers = os.cpu_count() or 1
+    settings = {"limit": 2, "caching": 0, "ordering": 0, "plies": 6, "seed": 0}
+
+    try:
+        opts, args = getopt.getopt(argv, "ha:f:d:n:l:cop:s:S:j:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-a":
+            filename = arg
+        elif opt == "-f":
+            directory = arg
+        elif opt == "-d":
+            size = int(arg)
+        elif opt == "-n":
+            games = int(arg)
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-c":
+            settings["caching"] = 1
+        elif opt == "-o":
+            settings["ordering"] = 1
+        elif opt == "-p":
+            settings["plies"] = int(arg)
+        elif opt == "-s":
+            shards = int(arg)
+        elif opt == "-S":
+            settings["seed"] = int(arg)
+        elif opt == "-j":
+            workers = int(arg)
+
+    if directory is None:
+        print(usage)
+        sys.exit(2)
+
+    writer = DatasetWriter(directory, size, shards)
+    tasks = [(n, size, settings) for n in range(games)]
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(filename,)) as pool:
+        for n, positions in enumerate(pool.imap_unordered(self_play, tasks), 1):
+            writer.write(positions)
+            if n % 10 == 0 or n == games:
+                writer.flush()
+                sys.stderr.write("\rgames {}/{}  positions {}  duplicates {}   ".format(
+                    n, games, writer.stats["written"], writer.stats["duplicates"]))
+    writer.close()
+    sys.stderr.write("\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module runs a sequential probability ratio test (SPRT) between a test
+agent and a base agent, to decide whether a change gains Elo without
+playing a fixed, usually far too large, number of games.
+
+Games are played in pairs from a shared set of random starting positions,
+each position once with the test agent as dark and once as light. After
+every pair the log-likelihood ratio of H1 (test is elo1 stronger) against
+H0 (test is elo0 stronger) is updated with the normal approximation over
+pair scores, and the match stops as soon as it leaves [ln(beta/(1-alpha)),
+ln((1-beta)/alpha)].
+
+    python3 othello_sprt.py -t agent.py -b agent2.py -d 6 -l 3 -0 0 -1 20
+"""
+import sys, getopt
+import math
+import os
+import random
+import multiprocessing
+
+from othello_game import OthelloGameManager
+from othello_positions import random_position
+from othello_tournament import init_worker, run_game, expected_score
+
+# Pair-score variance of the one pseudo-pair added to every estimate: the
+# largest possible, so that the estimate stays positive (and cautious) when
+# every pair so far scored the same.
+PRIOR_VARIANCE = 0.25
+
+
+def starting_positions(dimension, plies, count, seed=0):
+    """
+    Return up to count distinct (board, player to move) positions reached by
+    plies random moves from the initial board.
+    """
+    rng = random.Random(seed)
+    positions = []
+    seen = set()
+    attempts = 0
+    while len(positions) < count and attempts < count * 20:
+        attempts += 1
+        position = random_position(dimension, rng, plies, plies)
+        if position not in seen:
+            seen.add(position)
+            positions.append(position)
+    return positions
+
+
+def play_pair(args):
+    """
+    Play a position twice with colours swapped. Returns the test agent's
+    scores (1, 0.5 or 0) in both games.
+    """
+    number, position, test, base, settings = args
+    board, player = position
+    scores = []
+    for dark, light in ((test, base), (base, test)):
+        game = OthelloGameManager(len(board))
+        game.board = [list(row) for row in board]
+        game.current_player = player
+        row = run_game((number, len(board), dark, light), settings, game)
+        scores.append(row["score"] if dark == test else 1 - row["score"])
+    return scores
+
+
+def pair_variance(pair_scores, mean):
+    """
+    Variance of the pair scores, regularized with one PRIOR_VARIANCE pseudo-pair.
+    """
+    return (sum((x - mean) ** 2 for x in pair_scores) + PRIOR_VARIANCE) / (len(pair_scores) + 1)
+
+
+def llr(pair_scores, elo0, elo1):
+    """
+    Log-likelihood ratio of elo1 against elo0 for the list of pair scores
+    (mean score of each pair of games).
+    """
+    n = len(pair_scores)
+    if n < 2:
+        return 0.0
+    mean = sum(pair_scores) / n
+    variance = pair_variance(pair_scores, mean)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+
+def elo_estimate(pair_scores):
+    """
+    Elo difference and its 95% error margin from the pair scores.
+    """
+    n = len(pair_scores)
+    mean = sum(pair_scores) / n
+    variance = pair_variance(pair_scores, mean)
+
+    def elo(score):
+        score = min(max(score, 1e-3), 1 - 1e-3)
+        return -400 * math.log10(1 / score - 1)
+
+    margin = 1.96 * math.sqrt(variance / n)
+    return elo(mean), (elo(mean + margin) - elo(mean - margin)) / 2
+
+
+def main(argv):
+
+    usage = 'othello_sprt.py -t <test agent> -b <base agent> [-0 <elo0> -1 <elo1> -a <alpha> -e <beta>] [-d <size> -p <opening plies> -N <max pairs> -s <seed>] [-l <depth-limit> -c -o -m -i] [-j <workers>]'
+    test = base = None
+    elo0, elo1 = 0.0, 10.0
+    alpha = beta = 0.05
+    size = 6
+    plies = 4
+    max_pairs = 5000
+    seed = 0
+    workers = os.cpu_count() or 1
+    settings = {"limit": 4, "minimax": False, "caching": False, "ordering": False, "inprocess": False}
+
+    try:
+        opts, args = getopt.getopt(argv, "ht:b:0:1:a:e:d:p:N:s:l:cmoij:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-t":
+            test = arg
+        elif opt == "-b":
+            base = arg
+        elif opt == "-0":
+            elo0 = float(arg)
+        elif opt == "-1":
+            elo1 = float(arg)
+        elif opt == "-a":
+            alpha = float(arg)
+        elif opt == "-e":
+            beta = float(arg)
+        elif opt == "-d":
+            size = int(arg)
+        elif opt == "-p":
+            plies = int(arg)
+        elif opt == "-N":
+            max_pairs = int(arg)
+        elif opt == "-s":
+            seed = int(arg)
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-c":
+            settings["caching"] = True
+        elif opt == "-m":
+            settings["minimax"] = True
+        elif opt == "-o":
+            settings["ordering"] = True
+        elif opt == "-i":
+            settings["inprocess"] = True
+        elif opt == "-j":
+            workers = int(arg)
+
+    if test is None or base is None:
+        print(usage)
+        sys.exit(2)
+
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    positions = starting_positions(size, plies, max_pairs, seed)
+    tasks = [(n, positions[n % len(positions)], test, base, settings) for n in range(max_pairs)]
+    print("SPRT elo0={} elo1={} alpha={} beta={}  bounds [{:.2f}, {:.2f}]  {} positions".format(
+        elo0, elo1, alpha, beta, lower, upper, len(positions)))
+
+    pair_scores = []
+    wins = draws = losses = 0
+    verdict = "inconclusive (max pairs reached)"
+    pool = multiprocessing.Pool(workers, initializer=init_worker)
+    try:
+        for scores in pool.imap_unordered(play_pair, tasks):
+            for score in scores:
+                wins += score == 1
+                draws += score == 0.5
+                losses += score == 0
+            pair_scores.append(sum(scores) / 2)
+            ratio = llr(pair_scores, elo0, elo1)
+            elo, margin = elo_estimate(pair_scores)
+            sys.stdout.write("\rpairs {:>5}  W {} D {} L {}  elo {:+.1f} +- {:.1f}  LLR {:+.2f} [{:.2f}, {:.2f}]   ".format(
+                len(pair_scores), wins, draws, losses, elo, margin, ratio, lower, upper))
+            sys.stdout.flush()
+            if ratio >= upper:
+                verdict = "H1 accepted: {} is at least {} Elo stronger".format(test, elo1)
+                break
+            if ratio <= lower:
+                verdict = "H0 accepted: {} is not {} Elo stronger".format(test, elo1)
+                break
+    finally:
+        pool.terminate()
+    print()
+    print(verdict)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module runs headless Othello tournaments between AI files.
+
+Games are scheduled as a round robin (every pair of agents) or a gauntlet
+(the first agent against every other one), on one or more board sizes, with
+colours alternating between games of a pairing. They are played in parallel
+by a process pool with one worker per core; each worker keeps its AI
+processes in an AgentPool. Results are streamed to a CSV or JSON-lines file
+as games finish, and a table with win/draw/loss, disc differential, Elo and
+time per move is printed at the end.
+
+    python3 othello_tournament.py -a agent.py -a agent2.py -a randy_ai.py -d 4,6 -n 10 -l 3 -f results.csv
+"""
+import sys, getopt
+import csv
+import contextlib
+import io
+import itertools
+import json
+import os
+import subprocess
+import time
+import multiprocessing
+from multiprocessing import util
+
+from othello_game import OthelloGameManager, AiPlayerInterface, InProcessAiPlayer, InvalidMoveError, play_game
+from othello_pool import AgentPool
+from othello_record import RecordWriter
+
+FIELDS = ["game", "size", "dark", "light", "dark_score", "light_score", "score", "disc_diff",
+          "timed_out", "error", "dark_time", "light_time", "dark_moves", "light_moves", "moves"]
+
+worker_pool = None
+
+
+def init_worker():
+    """
+    Process pool initializer: silence the AIs and give the worker its own
+    pool of AI processes, stopped when the worker exits.
+    """
+    global worker_pool
+    AiPlayerInterface.STDERR = subprocess.DEVNULL
+    worker_pool = AgentPool()
+    util.Finalize(None, worker_pool.close, exitpriority=10)
+
+
+def schedule(agents, sizes, games, gauntlet=False):
+    """
+    Return the list of (game number, size, dark agent, light agent) to play.
+    Each pairing plays games games per size, alternating colours.
+    """
+    if gauntlet:
+        pairings = [(agents[0], other) for other in agents[1:]]
+    else:
+        pairings = list(itertools.combinations(agents, 2))
+    tasks = []
+    for size in sizes:
+        for first, second in pairings:
+            for n in range(games):
+                dark, light = (first, second) if n % 2 == 0 else (second, first)
+                tasks.append((len(tasks) + 1, size, dark, light))
+    return tasks
+
+
+def new_player(filename, color, settings):
+    if settings.get("inprocess"):
+        return InProcessAiPlayer(filename, color, settings["limit"], settings["minimax"],
+                                 settings["caching"], settings["ordering"])
+    return worker_pool.checkout(filename, color, settings["limit"], settings["minimax"],
+                                settings["caching"], settings["ordering"])
+
+
+def run_game(task, settings, game=None):
+    """
+    Play one scheduled game and return its result row. game may be an
+    OthelloGameManager set up with a starting position.
+    """
+    number, size, dark, light = task
+    if worker_pool is None:
+        init_worker()
+    if game is None:
+        game = OthelloGameManager(size)
+    error = ""
+    with contextlib.redirect_stdout(io.StringIO()):
+        player1 = new_player(dark, 1, settings)
+        player2 = new_player(light, 2, settings)
+        try:
+            result = play_game(game, player1, player2, verbose=False)
+            dark_score, light_score, timed_out = result.dark_score, result.light_score, result.timed_out
+            think_time = result.think_time
+        except (InvalidMoveError, ValueError, OSError) as e:
+            # An illegal or unreadable move loses the game for the player to move.
+            timed_out = None
+            error = "{} ({}): {}".format(dark if game.current_player == 1 else light, game.current_player, e)
+            dark_score, light_score = (0, 1) if game.current_player == 1 else (1, 0)
+            think_time = [None, 0.0, 0.0]
+            player1.kill(game)
+            player2.kill(game)
+
+    return result_row(task, game, dark_score, light_score, timed_out, think_time, error)
+
+
+def result_row(task, game, dark_score, light_score, timed_out, think_time, error=""):
+    """
+    Result row (see FIELDS) of the scheduled game task played on game.
+    """
+    number, size, dark, light = task
+    if timed_out is not None:
+        score = 0.0 if timed_out == 1 else 1.0
+    elif error:
+        score = 0.0 if dark_score < light_score else 1.0
+    else:
+        score = 1.0 if dark_score > light_score else (0.5 if dark_score == light_score else 0.0)
+    moves = [(i, j) for _, i, j in game.moves]
+    dark_moves = sum(1 for player, _, _ in game.moves if player == 1)
+    return {"game": number, "size": size, "dark": dark, "light": light,
+            "dark_score": dark_score, "light_score": light_score, "score": score,
+            "disc_diff": dark_score - light_score, "timed_out": timed_out or "", "error": error,
+            "dark_time": round(think_time[1], 4), "light_time": round(think_time[2], 4),
+            "dark_moves": dark_moves, "light_moves": len(moves) - dark_moves,
+            "moves": " ".join("{},{}".format(i, j) for i, j in moves)}
+
+
+def record_row(writer, row):
+    """
+    Append the game of a result row to an othello_record.RecordWriter. The
+    manager ends the game when the player to move cannot move, so the
+    players alternate.
+    """
+    moves = [(1 + n % 2, int(i), int(j)) for n, (i, j) in
+             enumerate(move.split(",") for move in row["moves"].split())]
+    writer.write_game(row["size"], row["dark"], row["light"], moves)
+
+
+def run_task(args):
+    return run_game(*args)
+
+
+class ResultWriter(object):
+    """
+    Appends result rows to a .csv or JSON-lines file as they arrive.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def expected_score(elo_difference):
+    return 1 / (1 + 10 ** (-elo_difference / 400))
+
+
+def elo_ratings(results, iterations=200):
+    """
+    Maximum likelihood Elo ratings (mean 0) from the result rows.
+    """
+    agents = sorted({row["dark"] for row in results} | {row["light"] for row in results})
+    ratings = dict((agent, 0.0) for agent in agents)
+    games = dict((agent, 0) for agent in agents)
+    for row in results:
+        games[row["dark"]] += 1
+        games[row["light"]] += 1
+    for _ in range(iterations):
+        delta = dict((agent, 0.0) for agent in agents)
+        for row in results:
+            expected = expected_score(ratings[row["dark"]] - ratings[row["light"]])
+            delta[row["dark"]] += row["score"] - expected
+            delta[row["light"]] -= row["score"] - expected
+        for agent in agents:
+            ratings[agent] += 400 * delta[agent] / max(1, games[agent])
+        mean = sum(ratings.values()) / len(ratings)
+        for agent in agents:
+            ratings[agent] = max(-2000.0, min(2000.0, ratings[agent] - mean))
+    return ratings
+
+
+def summarize(results):
+    """
+    Per-agent totals: wins, draws, losses, disc differential, Elo, time per move.
+    """
+    ratings = elo_ratings(results)
+    table = {}
+    for agent in ratings:
+        table[agent] = {"games": 0, "wins": 0, "draws": 0, "losses": 0, "disc_diff": 0,
+                        "time": 0.0, "moves": 0, "elo": ratings[agent]}
+    for row in results:
+        for agent, color, sign in ((row["dark"], "dark", 1), (row["light"], "light", -1)):
+            entry = table[agent]
+            score = row["score"] if sign == 1 else 1 - row["score"]
+            entry["games"] += 1
+            entry["wins" if score == 1 else ("draws" if score == 0.5 else "losses")] += 1
+            entry["disc_diff"] += sign * row["disc_diff"]
+            entry["time"] += row[color + "_time"]
+            entry["moves"] += row[color + "_moves"]
+    return table
+
+
+def print_summary(table):
+    print("{:<24} {:>6} {:>5} {:>5} {:>5} {:>9} {:>7} {:>10}".format(
+        "agent", "games", "win", "draw", "loss", "discs/g", "elo", "s/move"))
+    for agent, entry in sorted(table.items(), key=lambda item: -item[1]["elo"]):
+        print("{:<24} {:>6} {:>5} {:>5} {:>5} {:>9.2f} {:>7.0f} {:>10.4f}".format(
+            os.path.basename(agent), entry["games"], entry["wins"], entry["draws"], entry["losses"],
+            entry["disc_diff"] / max(1, entry["games"]), entry["elo"],
+            entry["time"] / max(1, entry["moves"])))
+
+
+def main(argv):
+
+    usage = 'othello_tournament.py -a <agent> -a <agent> [-a ...] [-g] [-d <size,...>] [-n <games per pairing>] [-l <depth-limit> -c -o -m -i] [-j <workers>] [-f <results.csv|.jsonl>] [-r <games.othr>]'
+    agents = []
+    sizes = [6]
+    games = 2
+    gauntlet = False
+    workers = os.cpu_count() or 1
+    output = None
+    records = None
+    settings = {"limit": 4, "minimax": False, "caching": False, "ordering": False, "inprocess": False}
+
+    try:
+        opts, args = getopt.getopt(argv, "ha:gd:n:l:cmoij:f:r:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-a":
+            agents.append(arg)
+        elif opt == "-g":
+            gauntlet = True
+        elif opt == "-d":
+            sizes = [int(x) for x in arg.split(",")]
+        elif opt == "-n":
+            games = int(arg)
+        elif opt == "-l":
+            settings["limit"] = int(arg)
+        elif opt == "-c":
+            settings["caching"] = True
+        elif opt == "-m":
+            settings["minimax"] = True
+        elif opt == "-o":
+            settings["ordering"] = True
+        elif opt == "-i":
+            settings["inprocess"] = True
+        elif opt == "-j":
+            workers = int(arg)
+        elif opt == "-f":
+            output = arg
+        elif opt == "-r":
+            records = arg
+
+    if len(agents) < 2:
+        print(usage)
+        sys.exit(2)
+
+    tasks = schedule(agents, sizes, games, gauntlet)
+    writer = ResultWriter(output) if output else None
+    recorder = RecordWriter(records) if records else None
+    results = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(min(workers, len(tasks)), initializer=init_worker) as pool:
+        for row in pool.imap_unordered(run_task, [(task, settings) for task in tasks]):
+            results.append(row)
+            if writer is not None:
+                writer.write(row)
+            if recorder is not None:
+                record_row(recorder, row)
+            print("game {:>5}/{}  {} {}:{} {}{}".format(
+                len(results), len(tasks), os.path.basename(row["dark"]), row["dark_score"],
+                row["light_score"], os.path.basename(row["light"]),
+                "  (timeout)" if row["timed_out"] else ("  (error)" if row["error"] else "")), file=sys.stderr)
+    if writer is not None:
+        writer.close()
+    if recorder is not None:
+        recorder.close()
+
+    print("{} games in {:.1f}s".format(len(results), time.perf_counter() - start))
+    print_summary(summarize(results))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
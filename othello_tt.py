@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module contains a transposition table in shared memory, so several
+search processes on one host (parallel searches, pondering, many games) can
+share their results.
+
+The table is a fixed array of 24 byte entries in a multiprocessing.shared_memory
+block, addressed by a Zobrist hash of the position. Buckets hold two entries:
+one kept for the deepest search, one always replaced. There are no locks.
+Every entry stores its key XORed with its data words, so a read that
+races a write (a torn entry) fails verification and counts as a miss.
+
+It can be used in place of agent.bound_states; keys are (board, color to move,
+root color) and values (depth, flag, value, move). A process tags its entries
+with the id of its search configuration (set_config), so searches that would
+value positions differently, such as with and without ProbCut, never use each
+other's entries. Create a table, then start the agents with
+OTHELLO_SHARED_TT=<name>; clear it between runs with -z:
+
+    python3 othello_tt.py -c -n othello_tt -s 1048576
+    OTHELLO_SHARED_TT=othello_tt python3 othello_gui.py -d 8 -a agent.py -b agent.py -c
+    python3 othello_tt.py -z -n othello_tt
+    python3 othello_tt.py -u -n othello_tt
+"""
+import sys, getopt
+import random
+import struct
+from multiprocessing import shared_memory, resource_tracker
+
+SHARED_TT_ENV = "OTHELLO_SHARED_TT"
+
+HEADER = struct.Struct("<8sQ")  # magic, number of entries
+MAGIC = b"OTHTT\x00\x00\x01"
+WORDS_PER_ENTRY = 3             # check, meta, value
+NO_MOVE = 0
+UNLIMITED_DEPTH = 255
+
+zobrist_tables = {}
+
+
+def zobrist_table(dimension):
+    """
+    Random 64 bit keys per (square, disc color), the same in every process.
+    """
+    if dimension not in zobrist_tables:
+        rng = random.Random(dimension)
+        zobrist_tables[dimension] = [rng.getrandbits(64) for _ in range(dimension * dimension * 2 + 4)]
+    return zobrist_tables[dimension]
+
+
+def zobrist_hash(board, to_move=1, color=1):
+    """
+    64 bit key of a board with the color to move and the searching (root) color.
+    """
+    n = len(board)
+    table = zobrist_table(n)
+    h = table[n * n * 2 + to_move - 1] ^ table[n * n * 2 + 1 + color]
+    k = 0
+    for row in board:
+        for v in row:
+            if v:
+                h ^= table[k + v - 1]
+            k += 2
+    return h
+
+
+def pack_meta(depth, flag, move):
+    depth = UNLIMITED_DEPTH if depth < 0 else min(depth, UNLIMITED_DEPTH - 1)
+    move_code = NO_MOVE if move is None else ((move[0] << 8) | move[1]) + 1
+    return depth | (flag << 8) | (move_code << 16)
+
+
+def unpack_meta(meta):
+    depth = meta & 0xFF
+    flag = (meta >> 8) & 0x3
+    move_code = (meta >> 16) & 0xFFFF
+    move = None if move_code == NO_MOVE else ((move_code - 1) >> 8, (move_code - 1) & 0xFF)
+    return (-1 if depth == UNLIMITED_DEPTH else depth), flag, move
+
+
+def float_bits(value):
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+
+def bits_float(bits):
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+class SharedTranspositionTable(object):
+
+    def __init__(self, shm):
+        self.shm = shm
+        magic, entries = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not an Othello transposition table".format(shm.name))
+        self.entries = entries
+        self.buckets = entries // 2
+        self.data = shm.buf[HEADER.size:HEADER.size + entries * WORDS_PER_ENTRY * 8]
+        self.words = self.data.cast("Q")
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self.config = 0  # XORed into every hash, see set_config
+
+    @classmethod
+    def create(cls, name=None, entries=1 << 20):
+        """
+        Create a new zeroed table with room for entries positions.
+        """
+        entries += entries % 2
+        size = HEADER.size + entries * WORDS_PER_ENTRY * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, entries)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to an existing table by name. Only its creator unlinks it.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 tracks (and unlinks) every attached block
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    def set_config(self, description):
+        """
+        Tag the entries this process reads and writes with a 64 bit id of
+        the search configuration description (a string).
+        """
+        self.config = random.Random(description).getrandbits(64)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def slots(self, h):
+        bucket = h % self.buckets
+        first = bucket * 2 * WORDS_PER_ENTRY
+        return first, first + WORDS_PER_ENTRY
+
+    def read(self, offset, h):
+        words = self.words
+        check, meta, value = words[offset], words[offset + 1], words[offset + 2]
+        if check == 0 and meta == 0:
+            return None
+        if check ^ meta ^ value != h:  # another position, or a torn write
+            return None
+        depth, flag, move = unpack_meta(meta)
+        return depth, flag, bits_float(value), move
+
+    def get(self, key, default=None):
+        h = zobrist_hash(*key) ^ self.config
+        for offset in self.slots(h):
+            entry = self.read(offset, h)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return entry
+        self.stats["misses"] += 1
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key, entry):
+        depth, flag, value, move = entry
+        h = zobrist_hash(*key) ^ self.config
+        meta = pack_meta(depth, flag, move)
+        value_bits = float_bits(value)
+        deep, always = self.slots(h)
+        words = self.words
+        stored_meta = words[deep + 1]
+        stored_same = (words[deep] ^ stored_meta ^ words[deep + 2]) == h
+        # The first slot keeps the deepest result, everything else goes to the second.
+        if stored_meta == 0 or stored_same or (meta & 0xFF) >= (stored_meta & 0xFF):
+            offset = deep
+        else:
+            offset = always
+        words[offset] = h ^ meta ^ value_bits
+        words[offset + 1] = meta
+        words[offset + 2] = value_bits
+        self.stats["writes"] += 1
+
+    def clear(self):
+        """
+        Zero all entries. This affects every attached process.
+        """
+        self.data[:] = bytes(len(self.data))
+
+    def close(self):
+        self.words.release()
+        self.data.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def main(argv):
+
+    usage = 'othello_tt.py -n <name> (-c [-s <entries>] | -z | -u)'
+    name = None
+    entries = 1 << 20
+    create = False
+    clear = False
+    unlink = False
+
+    try:
+        opts, args = getopt.getopt(argv, "hn:s:czu")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-n":
+            name = arg
+        elif opt == "-s":
+            entries = int(arg)
+        elif opt == "-c":
+            create = True
+        elif opt == "-z":
+            clear = True
+        elif opt == "-u":
+            unlink = True
+
+    if name is None or create + clear + unlink != 1:
+        print(usage)
+        sys.exit(2)
+
+    if create:
+        table = SharedTranspositionTable.create(name, entries)
+        # Keep the block alive after this process exits; remove it with -u.
+        resource_tracker.unregister(table.shm._name, "shared_memory")
+        print("Created {} with {} entries".format(table.name, table.entries))
+        table.close()
+    elif clear:
+        table = SharedTranspositionTable.attach(name)
+        table.clear()
+        print("Cleared {}".format(name))
+        table.close()
+    else:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+        print("Removed {}".format(name))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
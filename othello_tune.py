@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This module fits the weights of compute_heuristic in agent2.py and
+agent_competition.py to game outcomes, from a position dataset written by
+othello_selfplay.py.
+
+The features of compute_heuristic are computed for all positions at once
+with NumPy, from the point of view of the player to move:
+
+    utility  disc difference (compute_utility)
+    choice   mobility difference (compute_choice)
+    corner   corner difference (compute_corner)
+    xsquare  discs on the squares diagonally next to an empty corner
+    edge     discs on the edges, corners excluded
+
+The weights are fitted Texel-style: the win probability of the player to
+move is modelled as sigmoid(sum of weight * feature), and the log loss
+against the game outcomes (1 win, 0.5 draw, 0 loss) is minimised by
+mini-batch gradient descent. The weights are written as JSON, which those
+agents load at startup if OTHELLO_WEIGHTS names the file (see
+othello_heuristic):
+
+    python3 othello_tune.py -f data6 -o weights6.json
+    OTHELLO_WEIGHTS=weights6.json python3 othello_gui.py -d 6 -a agent2.py
+"""
+import sys, getopt
+import json
+import time
+
+import numpy as np
+
+from othello_selfplay import load_shards, unpack_boards
+
+FEATURES = ["utility", "choice", "corner", "xsquare", "edge"]
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+CHUNK = 1 << 18  # positions per feature extraction batch
+
+
+def shift(mask, di, dj):
+    """
+    Move every square of a stack of (N, n, n) masks by (di, dj); squares
+    moved off the board are dropped.
+    """
+    n = mask.shape[1]
+    out = np.zeros_like(mask)
+    out[:, max(di, 0):n + min(di, 0), max(dj, 0):n + min(dj, 0)] = \
+        mask[:, max(-di, 0):n - max(di, 0), max(-dj, 0):n - max(dj, 0)]
+    return out
+
+
+def mobility(own, opponent):
+    """
+    Number of legal moves for the owner of own, for a stack of boards.
+    """
+    empty = ~(own | opponent)
+    moves = np.zeros_like(own)
+    for di, dj in DIRECTIONS:
+        line = shift(own, di, dj) & opponent
+        for _ in range(own.shape[1] - 3):
+            line |= shift(line, di, dj) & opponent
+        moves |= shift(line, di, dj) & empty
+    return moves.sum(axis=(1, 2))
+
+
+def extract_features(boards, to_move):
+    """
+    (N, len(FEATURES)) float32 features of (N, n, n) boards for the player
+    to move.
+    """
+    n = boards.shape[1]
+    own = boards == to_move[:, None, None]
+    opponent = boards == (3 - to_move)[:, None, None]
+    diff = own.astype(np.int16) - opponent.astype(np.int16)
+
+    corners = [(0, 0), (0, n - 1), (n - 1, 0), (n - 1, n - 1)]
+    xsquares = [(1, 1), (1, n - 2), (n - 2, 1), (n - 2, n - 2)]
+    corner = sum(diff[:, i, j] for i, j in corners)
+    xsquare = sum(diff[:, xi, xj] * (boards[:, i, j] == 0) for (i, j), (xi, xj) in zip(corners, xsquares))
+    border = diff[:, 0, :].sum(axis=1) + diff[:, n - 1, :].sum(axis=1) + \
+        diff[:, 1:n - 1, 0].sum(axis=1) + diff[:, 1:n - 1, n - 1].sum(axis=1)
+
+    columns = {"utility": diff.sum(axis=(1, 2)),
+               "choice": mobility(own, opponent) - mobility(opponent, own),
+               "corner": corner,
+               "xsquare": xsquare,
+               "edge": border - corner}
+    return np.stack([columns[name] for name in FEATURES], axis=1).astype(np.float32)
+
+
+def outcomes(records):
+    """
+    1 if the player to move won, 0.5 for a draw, 0 if they lost.
+    """
+    sign = np.where(records["to_move"] == 1, 1, -1) * np.sign(records["result"])
+    return (sign + 1).astype(np.float32) / 2
+
+
+def load_features(directory):
+    """
+    Features and outcomes of every position of a dataset, extracted a chunk
+    at a time from the memory-mapped shards.
+    """
+    size, shards = load_shards(directory)
+    features, targets = [], []
+    for shard in shards:
+        for start in range(0, len(shard), CHUNK):
+            records = np.asarray(shard[start:start + CHUNK])
+            boards = unpack_boards(records, size)
+            features.append(extract_features(boards, records["to_move"].astype(np.int8)))
+            targets.append(outcomes(records))
+    if not features:
+        return size, np.zeros((0, len(FEATURES)), np.float32), np.zeros(0, np.float32)
+    return size, np.concatenate(features), np.concatenate(targets)
+
+
+def log_loss(x, y, w):
+    p = 1 / (1 + np.exp(-(x @ w)))
+    p = np.clip(p, 1e-7, 1 - 1e-7)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def fit(x, y, epochs=20, batch=4096, rate=0.1, l2=1e-4, momentum=0.9, seed=0, validation=0.1, verbose=True):
+    """
+    Fit weights w so that sigmoid(x @ w) predicts y, by mini-batch gradient
+    descent with momentum on standardized features. Returns (weights,
+    training loss, validation loss).
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(x))
+    held = int(len(x) * validation)
+    x_val, y_val = x[order[:held]], y[order[:held]]
+    x_fit, y_fit = x[order[held:]], y[order[held:]]
+
+    # The features are symmetric between the players, so there is no
+    # intercept and they are scaled but not centered.
+    scale = np.sqrt(np.mean(x_fit.astype(np.float64) ** 2, axis=0))
+    scale[scale == 0] = 1
+    xs = (x_fit / scale).astype(np.float32)
+    w = np.zeros(x.shape[1])
+    velocity = np.zeros_like(w)
+    for epoch in range(epochs):
+        for start in range(0, len(xs), batch):
+            pick = rng.integers(0, len(xs), size=min(batch, len(xs)))
+            xb, yb = xs[pick], y_fit[pick]
+            p = 1 / (1 + np.exp(-(xb @ w)))
+            gradient = xb.T @ (p - yb) / len(xb) + l2 * w
+            velocity = momentum * velocity - rate * gradient
+            w += velocity
+        if verbose:
+            sys.stderr.write("epoch {:>3}  loss {:.5f}\n".format(epoch + 1, log_loss(xs, y_fit, w)))
+    weights = w / scale
+    val_loss = log_loss(x_val, y_val, weights) if held else None
+    return weights, log_loss(x_fit, y_fit, weights), val_loss
+
+
+def main(argv):
+
+    usage = 'othello_tune.py -f <dataset dir> [-o <weights.json>] [-e <epochs>] [-b <batch>] [-r <rate>] [-2 <l2>] [-s <seed>]'
+    directory = None
+    output = "weights.json"
+    options = {}
+
+    try:
+        opts, args = getopt.getopt(argv, "hf:o:e:b:r:2:s:")
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            sys.exit()
+        elif opt == "-f":
+            directory = arg
+        elif opt == "-o":
+            output = arg
+        elif opt == "-e":
+            options["epochs"] = int(arg)
+        elif opt == "-b":
+            options["batch"] = int(arg)
+        elif opt == "-r":
+            options["rate"] = float(arg)
+        elif opt == "-2":
+            options["l2"] = float(arg)
+        elif opt == "-s":
+            options["seed"] = int(arg)
+
+    if directory is None:
+        print(usage)
+        sys.exit(2)
+
+    start = time.perf_counter()
+    size, x, y = load_features(directory)
+    print("{} positions, features in {:.1f}s".format(len(x), time.perf_counter() - start))
+    if not len(x):
+        sys.exit(1)
+    weights, loss, val_loss = fit(x, y, **options)
+    print("fitted in {:.1f}s, loss {:.5f}, validation loss {}".format(
+        time.perf_counter() - start, loss, "-" if val_loss is None else "{:.5f}".format(val_loss)))
+    for name, weight in zip(FEATURES, weights):
+        print("{:<8} {:+.5f}".format(name, weight))
+    with open(output, "w") as f:
+        json.dump({"size": size, "positions": len(x), "loss": loss, "validation_loss": val_loss,
+                   "weights": dict(zip(FEATURES, [float(w) for w in weights]))}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -13,7 +13,8 @@ import sys
 import time
 
 # You can also use the functions in othello_shared to write your AI 
-from othello_shared import find_lines, get_possible_moves
+from othello_shared import find_lines, get_possible_moves, play_move
+from othello_protocol import introduction, setup_version, read_position, next_game
 
 def select_move(board, color):
     """
@@ -38,39 +39,36 @@ def run_ai():
     Then it repeatedly receives the current score and current board state
     until the game is over. 
     """
-    print("Randy") # First line is the name of this AI  
+    print(introduction("Randy")) # First line is the name of this AI and its protocol version
 
-    arguments = input().split(",")
-    color = int(arguments[0]) # We read the color: 1 for dark (goes first), 2 for light. 
+    setup = input()
+    while setup is not None: # One game per setup line, the manager may reuse us for more games
+        arguments = setup.split(",")
+        color = int(arguments[0]) # We read the color: 1 for dark (goes first), 2 for light. 
     
-    #All of the arguments below have no impact on Randy but will impact your AI.
-    limit = int(arguments[1]) #sets depth limit
-    minimax = int(arguments[2]) #minimax or alpha beta?
-    caching = int(arguments[3]) #caching or no?
-    ordering = int(arguments[4]) #node-ordering (for alpha-beta) or no?
+        #All of the arguments below have no impact on Randy but will impact your AI.
+        limit = int(arguments[1]) #sets depth limit
+        minimax = int(arguments[2]) #minimax or alpha beta?
+        caching = int(arguments[3]) #caching or no?
+        ordering = int(arguments[4]) #node-ordering (for alpha-beta) or no?
+        version = setup_version(arguments) #board format chosen by the manager
     
-    while True: # This is the main loop 
-        # Read in the current game status, for example:
-        # "SCORE 2 2" or "FINAL 33 31" if the game is over.
-        # The first number is the score for player 1 (dark), the second for player 2 (light)
-        next_input = input() 
-        status, dark_score_s, light_score_s = next_input.strip().split()
-        dark_score = int(dark_score_s)
-        light_score = int(light_score_s)
+        board = None
+        while True: # This is the main loop 
+            # Read in the current game status and board, for example:
+            # "SCORE 2 2" or "FINAL 33 31" if the game is over (the scores of dark and light) and the board,
+            # or with protocol 3 just the moves played since our last move (see othello_protocol).
+            status, board = read_position(version, board, color)
 
-        if status == "FINAL": # Game is over. 
-            print 
-        else: 
-            board = eval(input()) # Read in the input and turn it into a Python
-                                  # object. The format is a list of rows. The 
-                                  # squares in each row are represented by 
-                                  # 0 : empty square
-                                  # 1 : dark disk (player 1)
-                                  # 2 : light disk (player 2)
-                    
-            # Select the move and send it to the manager 
-            movei, movej = select_move(board, color)
-            print("{} {}".format(movei, movej)) 
+            if status == "FINAL": # Game is over. 
+                break 
+            else: 
+                # Select the move and send it to the manager 
+                movei, movej = select_move(board, color)
+                print("{} {}".format(movei, movej)) 
+                board = play_move(board, color, movei, movej) # Keep our own board up to date
+
+        setup = next_game(version) # "RESET <setup>" starts another game, otherwise we are done
 
 
 if __name__ == "__main__":
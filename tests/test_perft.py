@@ -0,0 +1,18 @@
+"""
+othello_shared's move generator against the known perft counts.
+"""
+import pytest
+
+import othello_shared
+from othello_game import OthelloGameManager
+from othello_perft import KNOWN_COUNTS, perft
+
+# Deeper counts take too long for a test run; othello_perft.py checks them all.
+DEPTHS = {4: 16, 6: 6, 8: 5}
+
+
+@pytest.mark.parametrize("size", sorted(DEPTHS))
+def test_known_counts(size):
+    board = tuple(tuple(row) for row in OthelloGameManager(size).board)
+    for depth, count in enumerate(KNOWN_COUNTS[size][:DEPTHS[size]], 1):
+        assert perft(board, 1, depth, othello_shared) == count, "depth {}".format(depth)
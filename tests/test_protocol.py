@@ -0,0 +1,86 @@
+"""
+Round trips of the manager <-> AI messages in othello_protocol.
+"""
+import random
+
+import pytest
+
+from othello_protocol import (introduction, parse_introduction, negotiate, setup_version, next_game,
+                              encode_board, decode_board, board_checksum, encode_delta, read_position,
+                              encode_info, parse_info, PROTOCOL_VERSION)
+from othello_positions import random_position
+from othello_shared import get_possible_moves, play_move
+
+
+def feed(monkeypatch, lines):
+    """
+    Make input() return lines one at a time.
+    """
+    lines = iter(lines)
+    monkeypatch.setattr("builtins.input", lambda: next(lines))
+
+
+def test_introduction_round_trip():
+    assert parse_introduction(introduction("Othello AI")) == ("Othello AI", PROTOCOL_VERSION)
+    assert parse_introduction(introduction("Old AI", 2) + "\n") == ("Old AI", 2)
+    assert parse_introduction("Plain name\n") == ("Plain name", 1)
+
+
+def test_negotiate_asks_for_info_only_when_wanted():
+    assert negotiate(PROTOCOL_VERSION) == 4
+    assert negotiate(PROTOCOL_VERSION, info=True) == PROTOCOL_VERSION
+    assert negotiate(2, info=True) == 2
+    assert negotiate(PROTOCOL_VERSION + 1, info=True) == PROTOCOL_VERSION
+
+
+def test_setup_version():
+    assert setup_version("1,4,0,1,1".split(",")) == 1
+    assert setup_version("1,4,0,1,1,3".split(",")) == 3
+
+
+def test_next_game(monkeypatch):
+    assert next_game(3) is None
+    feed(monkeypatch, ["RESET 2,4,0,0,0,4"])
+    assert next_game(4) == "2,4,0,0,0,4"
+
+
+@pytest.mark.parametrize("version", [1, 2])
+@pytest.mark.parametrize("size", [4, 6, 8])
+def test_board_round_trip(version, size):
+    rng = random.Random(size)
+    for _ in range(20):
+        board, _ = random_position(size, rng)
+        assert decode_board(encode_board(board, version), version) == board
+
+
+def test_delta_applies_opponent_moves(monkeypatch):
+    rng = random.Random(1)
+    board, color = random_position(6, rng)
+    opponent = 1 if color == 2 else 2
+    moves = get_possible_moves(board, opponent)[:1]
+    after = play_move(board, opponent, *moves[0]) if moves else board
+    for check in (None, after):
+        feed(monkeypatch, [encode_delta(moves, check)])
+        assert read_position(3, board, color) == ("DELTA", after)
+
+
+def test_delta_with_bad_checksum_asks_for_resync(monkeypatch, capsys):
+    board, color = random_position(6, random.Random(2))
+    wrong = tuple(tuple(0 for _ in row) for row in board)
+    feed(monkeypatch, ["DELTA {}".format(board_checksum(board)), "BOARD " + encode_board(board, 2)])
+    assert read_position(3, wrong, color) == ("BOARD", board)
+    assert capsys.readouterr().out == "RESYNC\n"
+
+
+def test_final_keeps_board(monkeypatch):
+    board, color = random_position(4, random.Random(3))
+    for version in (1, 3):
+        feed(monkeypatch, ["FINAL 9 7"])
+        assert read_position(version, board, color) == ("FINAL", board)
+
+
+def test_info_round_trip():
+    info = parse_info(encode_info(7, 12345, 0.5, -2.5, [(1, 2), (3, 4)]))
+    assert info == {"depth": 7, "nodes": 12345, "time": 0.5, "nps": 24690, "score": -2.5,
+                    "pv": [(1, 2), (3, 4)]}
+    assert parse_info(encode_info(1, 0, 0, 0, []))["pv"] == []
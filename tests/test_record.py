@@ -0,0 +1,65 @@
+"""
+Games written by othello_record read back unchanged.
+"""
+import random
+
+import pytest
+
+from othello_game import OthelloGameManager
+from othello_positions import random_position
+from othello_record import RecordWriter, RecordError, read_records, replay, final_board
+
+
+def random_game(size, rng, board=None, player=1):
+    """
+    Play a random game and return its OthelloGameManager.
+    """
+    game = OthelloGameManager(size)
+    if board is not None:
+        game.board = [list(row) for row in board]
+        game.current_player = player
+    while game.get_possible_moves():
+        game.play(*rng.choice(game.get_possible_moves()))
+    return game
+
+
+@pytest.mark.parametrize("size", [4, 6, 8, 16])
+def test_round_trip(tmp_path, size):
+    rng = random.Random(size)
+    path = str(tmp_path / "games.othr")
+    start, player = random_position(size, rng, max_plies=6, min_plies=1)
+    games = [(random_game(size, rng), None, 1), (random_game(size, rng, start, player), start, player)]
+    writer = RecordWriter(path)
+    for game, board, to_move in games:
+        writer.write_game(size, "dark ai", "light ai", game.moves, board, to_move)
+    writer.close()
+
+    records = list(read_records(path))
+    assert len(records) == len(games)
+    for record, (game, board, to_move) in zip(records, games):
+        assert (record.size, record.dark, record.light, record.board, record.player) == \
+            (size, "dark ai", "light ai", board, to_move)
+        assert [(mover,) + move for _, mover, move in replay(record) if move is not None] == game.moves
+        assert final_board(record) == tuple(tuple(row) for row in game.board)
+
+
+def test_streamed_game_and_append(tmp_path):
+    path = str(tmp_path / "games.othr")
+    writer = RecordWriter(path)
+    writer.begin_game(4, "a", "b")
+    writer.move((0, 1))
+    writer.move(None)
+    writer.end_game()
+    writer.close()
+    writer = RecordWriter(path)
+    writer.write_game(6, "c", "d", [])
+    writer.close()
+    records = list(read_records(path))
+    assert [(r.size, r.dark, r.moves) for r in records] == [(4, "a", [(0, 1), None]), (6, "c", [])]
+
+
+def test_not_a_record(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"nope")
+    with pytest.raises(RecordError):
+        list(read_records(str(path)))
@@ -0,0 +1,28 @@
+"""
+othello_tune's vectorized features must be the features the agents weight.
+"""
+import random
+
+import numpy as np
+import pytest
+
+import agent2
+from othello_heuristic import DEFAULT_WEIGHTS
+from othello_positions import random_position
+from othello_tune import FEATURES, extract_features
+
+
+@pytest.mark.parametrize("size", [4, 6, 8])
+def test_features_match_agent2(size):
+    rng = random.Random(size)
+    positions = [random_position(size, rng) for _ in range(200)]
+    boards = np.array([board for board, _ in positions], dtype=np.int8)
+    to_move = np.array([color for _, color in positions], dtype=np.int8)
+    features = extract_features(boards, to_move)
+    for (board, color), row in zip(positions, features):
+        expected = [agent2.heuristic_features[name](board, color) for name in FEATURES]
+        assert row.tolist() == expected
+
+
+def test_default_weights_name_features():
+    assert set(DEFAULT_WEIGHTS) <= set(FEATURES)